@@ -0,0 +1,141 @@
+"""Generate and solve many boards in parallel, streaming the results to JSONL.
+
+The first output line records the batch settings; every other line holds
+one board, its solution length, whether that length is proven optimal
+(always with the astar, idastar, bfs and bidirectional modes, not with
+weighted) and the number of states the solver expanded:
+
+    {"settings": {"seed": 1, "tubes": 6, "colors": 4, "capacity": 4, "mode": "astar", ...}}
+    {"index": 0, "seed": "1:0", "board": [["red", ...], ...], "status": "solved",
+     "length": 14, "optimal": true, "nodes_expanded": 20, "elapsed": 0.002}
+
+Board i is generated from the seed "<seed>:<i>", so any board can be
+regenerated on its own.  Re-running the same command after an interruption
+skips the boards already in the output file; resuming with different
+settings (other than --count and --workers) is refused.
+
+    python batch_solve.py --seed 1 --count 10000 --output boards.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import time
+from multiprocessing import Pool, cpu_count
+
+from color_sort_core import PALETTE, PuzzleSpec
+from solver import Solver
+
+_solver = None
+_settings = None
+_spec = None
+
+
+def _init_worker(settings):
+    global _solver, _settings, _spec
+    _settings = settings
+    _spec = PuzzleSpec.from_containers(settings["tubes"], settings["colors"], settings["capacity"])
+    _solver = Solver(mode=settings["mode"], capacity=settings["capacity"],
+                     time_budget=settings["time_budget"], max_memory=settings["max_memory"])
+
+
+def solve_board(index):
+    """Generate board `index` of the batch and solve it; runs in a worker process."""
+    settings = _settings
+    seed = f"{settings['seed']}:{index}"
+    containers = _spec.generate(random.Random(seed))
+    start = time.perf_counter()
+    result = _solver.solve(containers, colors=_spec.colors)
+    return {
+        "index": index,
+        "seed": seed,
+        "board": containers,
+        "status": result.status,
+        "length": len(result.moves) if result.found else None,
+        "optimal": result.optimal,
+        "nodes_expanded": result.nodes_expanded,
+        "elapsed": round(time.perf_counter() - start, 6),
+    }
+
+
+def completed_indices(path, settings):
+    """Indices already in `path`; a line cut short by an interruption is dropped from the file.
+
+    Raises ValueError if the file was written with other settings, because
+    its boards and the new ones wouldn't form one batch.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    good_size = 0
+    with open(path, "rb") as output:
+        header = output.readline()
+        if header.endswith(b"\n"):  # Otherwise the run was interrupted while writing it
+            try:
+                written = json.loads(header)["settings"]
+            except (ValueError, KeyError, TypeError):
+                raise ValueError(f"{path} doesn't start with a batch settings line")
+            if written != settings:
+                changed = ", ".join(f"{key} {written.get(key)!r} -> {value!r}"
+                                    for key, value in settings.items() if written.get(key) != value)
+                raise ValueError(f"{path} was written with other settings ({changed})")
+            good_size = len(header)
+            for line in output:
+                try:
+                    done.add(json.loads(line)["index"])
+                except (ValueError, KeyError):
+                    break
+                good_size += len(line)
+    with open(path, "r+b") as output:
+        output.truncate(good_size)
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and solve Color Sort boards in parallel.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--count", type=int, default=1000, help="number of boards in the batch")
+    parser.add_argument("--tubes", type=int, default=6, help="containers per board")
+    parser.add_argument("--colors", type=int, default=4, help=f"ball colors per board (max {len(PALETTE)})")
+    parser.add_argument("--capacity", type=int, default=4, help="balls per container")
+    parser.add_argument("--mode", default="astar", choices=Solver.MODES)
+    parser.add_argument("--time-budget", type=float, default=None, help="seconds allowed per board")
+    parser.add_argument("--max-memory", type=int, default=512 * 1024 * 1024, help="bytes allowed per search")
+    parser.add_argument("--workers", type=int, default=cpu_count())
+    parser.add_argument("--output", default="boards.jsonl")
+    args = parser.parse_args()
+    try:
+        PuzzleSpec.from_containers(args.tubes, args.colors, args.capacity)
+    except ValueError as error:
+        parser.error(str(error))
+
+    settings = {
+        "seed": args.seed, "tubes": args.tubes, "colors": args.colors, "capacity": args.capacity,
+        "mode": args.mode, "time_budget": args.time_budget, "max_memory": args.max_memory,
+    }
+    try:
+        done = completed_indices(args.output, settings)
+    except ValueError as error:
+        parser.error(f"{error}; pick another --output to start a new batch")
+    todo = [index for index in range(args.count) if index not in done]
+    print(f"{len(done)} boards already solved, {len(todo)} to go on {args.workers} workers.")
+
+    start = time.perf_counter()
+    with open(args.output, "a") as output, Pool(args.workers, _init_worker, (settings,)) as pool:
+        if not output.tell():
+            output.write(json.dumps({"settings": settings}, separators=(",", ":")) + "\n")
+            output.flush()
+        # Unordered results keep every worker busy; each line is flushed so an
+        # interruption loses at most the boards still in flight.
+        for count, record in enumerate(pool.imap_unordered(solve_board, todo, chunksize=8), start=1):
+            output.write(json.dumps(record, separators=(",", ":")) + "\n")
+            output.flush()
+            if count % 1000 == 0:
+                print(f"{count} boards, {count / (time.perf_counter() - start):.0f} boards/s")
+    elapsed = time.perf_counter() - start
+    if todo:
+        print(f"Solved {len(todo)} boards in {elapsed:.1f}s ({len(todo) / elapsed:.0f} boards/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Time ColorSortGame.draw offscreen, using SDL's dummy video and audio drivers.
+
+Run from the repository root:
+
+    python -m benchmarks.render_benchmark --frames 600
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import pygame
+
+import color_sort_game
+
+
+def setup(seed=None):
+    """Initialize pygame the way color_sort_game.main() does, minus the music."""
+    pygame.init()
+    pygame.mixer.init()
+    color_sort_game.screen = pygame.display.set_mode((color_sort_game.SCREEN_WIDTH, color_sort_game.SCREEN_HEIGHT))
+    color_sort_game.clock = pygame.time.Clock()
+    rng = random.Random(seed) if seed is not None else random
+    # A throwaway in-memory cache, so timing runs neither read nor fill the player's solution_cache.sqlite3
+    game = color_sort_game.ColorSortGame(rng=rng, cache_path=":memory:")
+    game.wait_for_board()
+    return game
+
+
+def frame_times(game, frames):
+    """Milliseconds spent drawing each frame (everything the main loop draws)."""
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        game.draw()
+        game.draw_move_counter()
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--frames", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    game = setup(args.seed)
+    frame_times(game, 10)  # Warm up lazy asset loading
+    times = sorted(frame_times(game, args.frames))
+    print(f"{args.frames} frames: mean {statistics.mean(times):.3f} ms, "
+          f"median {statistics.median(times):.3f} ms, p95 {times[int(len(times) * 0.95)]:.3f} ms")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Solve time and memory as the board grows.
+
+Each size is COLORSxEMPTYxCAPACITY, e.g. 12x2x4 is twelve full containers,
+two empty ones and four balls per container.  Run from the repository root:
+
+    python -m benchmarks.scaling_benchmark --boards 3 --seed 1
+    python -m benchmarks.scaling_benchmark --sizes 12x2x4 16x2x4 --mode weighted --tracemalloc
+"""
+import argparse
+import random
+import tracemalloc
+
+from color_sort_core import PuzzleSpec
+from solver import Solver
+
+DEFAULT_SIZES = ["4x2x4", "6x2x4", "8x2x4", "10x2x4", "12x2x4", "14x2x4", "16x2x4", "8x2x6", "12x2x6"]
+
+
+def parse_size(text):
+    try:
+        num_colors, empty_containers, capacity = (int(part) for part in text.split("x"))
+        return PuzzleSpec(num_colors, empty_containers, capacity)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"bad size {text!r}: {error}")
+
+
+def measure(spec, boards, seed, mode, time_budget, max_memory, trace):
+    """Solve `boards` seeded boards of one size; returns per-board (result, peak bytes or None)."""
+    rng = random.Random(f"{seed}:{spec.num_colors}x{spec.empty_containers}x{spec.capacity}")
+    solver = Solver(mode=mode, capacity=spec.capacity, time_budget=time_budget, max_memory=max_memory)
+    runs = []
+    for _ in range(boards):
+        board = tuple(tuple(container) for container in spec.generate(rng))
+        if trace:
+            tracemalloc.start()
+        result = solver.solve(board, colors=spec.colors)
+        peak = None
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        runs.append((result, peak))
+    return runs
+
+
+def report(spec, runs):
+    results = [result for result, _ in runs]
+    solved = [result for result in results if result.found]
+    elapsed = sorted(result.elapsed for result in results)
+    stored = max(result.states_stored for result in results)
+    estimate = max(result.memory_estimate for result in results)
+    peaks = [peak for _, peak in runs if peak is not None]
+    memory = f"peak={max(peaks) / 2**20:7.1f}MiB" if peaks else f"est={estimate / 2**20:7.1f}MiB"
+    length = sum(len(result.moves) for result in solved) / len(solved) if solved else float("nan")
+    print(f"{spec.num_colors:>3}x{spec.empty_containers}x{spec.capacity:<3} tubes={spec.num_containers:<3} "
+          f"solved={len(solved)}/{len(results)} length={length:6.1f} "
+          f"time median={elapsed[len(elapsed) // 2]:7.3f}s max={elapsed[-1]:7.3f}s "
+          f"expanded={sum(result.nodes_expanded for result in results) // len(results):<8} "
+          f"stored max={stored:<8} {memory}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[parse_size(size) for size in DEFAULT_SIZES])
+    parser.add_argument("--boards", type=int, default=3, help="boards per size")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--mode", default="astar", choices=[mode for mode in Solver.MODES if mode != "bfs"])
+    parser.add_argument("--time-budget", type=float, default=30.0, help="seconds allowed per board")
+    parser.add_argument("--max-memory", type=int, default=512 * 1024 * 1024, help="bytes allowed per search")
+    parser.add_argument("--tracemalloc", action="store_true",
+                        help="measure each search's real peak allocation (slower) instead of estimating it")
+    args = parser.parse_args()
+    for spec in args.sizes:
+        report(spec, measure(spec, args.boards, args.seed, args.mode, args.time_budget, args.max_memory,
+                             args.tracemalloc))
+
+
+if __name__ == "__main__":
+    main()
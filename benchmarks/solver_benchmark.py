@@ -0,0 +1,206 @@
+"""Compare the solver modes on the same seeded boards.
+
+Run from the repository root:
+
+    python -m benchmarks.solver_benchmark --boards 5 --seed 1
+    python -m benchmarks.solver_benchmark --encoding
+    python -m benchmarks.solver_benchmark --symmetry
+    python -m benchmarks.solver_benchmark --bidirectional --colors 8
+    python -m benchmarks.solver_benchmark --pruning --colors 6
+"""
+import argparse
+import random
+import sys
+import time
+from collections import deque
+
+from color_sort_core import (BALLS_PER_CONTAINER, COLORS, NUM_CONTAINERS, ColorSortBoard, add_spec_arguments,
+                             generate_containers, generate_solvable_containers, spec_from_args)
+from packed_state import StateCodec
+from solver import Solver
+
+
+def original_bfs(capacity=BALLS_PER_CONTAINER, time_budget=None):
+    """Breadth-first search without symmetry reduction or pruning, like the original game code."""
+    return Solver(mode="bfs", capacity=capacity, time_budget=time_budget, symmetry=False, prune=False)
+
+
+def random_board(rng, num_containers=NUM_CONTAINERS, capacity=BALLS_PER_CONTAINER, colors=COLORS):
+    """A seeded board from the game's generator, as a tuple-of-tuples state."""
+    return tuple(tuple(container) for container in generate_containers(rng, num_containers, capacity, colors))
+
+
+def legacy_make_move(state, from_idx, to_idx, capacity=4):
+    """The original ColorSortGame.make_move, deque copies and all."""
+    state_copy = [deque(container) for container in state]
+    if state_copy[from_idx] and (len(state_copy[to_idx]) < capacity):
+        if not state_copy[to_idx] or state_copy[from_idx][-1] == state_copy[to_idx][-1]:
+            state_copy[to_idx].append(state_copy[from_idx].pop())
+            return tuple(tuple(container) for container in state_copy)
+    return None
+
+
+def _tuple_state_size(state):
+    return sys.getsizeof(state) + sum(sys.getsizeof(container) for container in state)
+
+
+def encoding_report(board, capacity=4):
+    """Enumerate every state reachable from `board` with both representations."""
+    num_containers = len(board)
+    start = time.perf_counter()
+    visited = {board}
+    queue = deque([board])
+    while queue:
+        state = queue.popleft()
+        for i in range(num_containers):
+            for j in range(num_containers):
+                if i != j:
+                    new_state = legacy_make_move(state, i, j, capacity)
+                    if new_state and new_state not in visited:
+                        visited.add(new_state)
+                        queue.append(new_state)
+    tuple_time = time.perf_counter() - start
+    tuple_bytes = sum(_tuple_state_size(state) for state in visited) / len(visited)
+
+    codec = StateCodec.for_state(board, capacity)
+    start = time.perf_counter()
+    initial = codec.encode(board)
+    packed_visited = {initial}
+    queue = deque([initial])
+    while queue:
+        code = queue.popleft()
+        for _, _, new_code in codec.successors(code):
+            if new_code not in packed_visited:
+                packed_visited.add(new_code)
+                queue.append(new_code)
+    packed_time = time.perf_counter() - start
+    packed_bytes = sum(sys.getsizeof(code) for code in packed_visited) / len(packed_visited)
+
+    assert len(visited) == len(packed_visited)
+    count = len(visited)
+    print(f"Reachable states: {count}")
+    print(f"  tuples  {count / tuple_time:>10.0f} states/s  {tuple_bytes:6.1f} bytes/state")
+    print(f"  packed  {count / packed_time:>10.0f} states/s  {packed_bytes:6.1f} bytes/state")
+    print(f"  speedup {tuple_time / packed_time:.1f}x, memory {tuple_bytes / packed_bytes:.1f}x smaller")
+
+
+def symmetry_report(boards, seed, modes):
+    """States stored with and without tube-permutation canonicalization."""
+    rng = random.Random(seed)
+    for index in range(boards):
+        board = random_board(rng)
+        print(f"Board {index + 1}:")
+        for mode in modes:
+            plain = Solver(mode=mode, symmetry=False).solve(board)
+            canonical = Solver(mode=mode, symmetry=True).solve(board)
+            print(f"  {mode:<9} stored {plain.states_stored:>7} -> {canonical.states_stored:<7} "
+                  f"expanded {plain.nodes_expanded:>7} -> {canonical.nodes_expanded:<7} "
+                  f"({plain.states_stored / max(1, canonical.states_stored):.1f}x fewer states)")
+
+
+def bidirectional_report(boards, seed, spec, time_budget):
+    """Bidirectional search against the game's own search and the original BFS on the same boards."""
+    rng = random.Random(seed)
+    searches = [("game", ColorSortBoard(spec=spec).solver),
+                ("original bfs", original_bfs(spec.capacity, time_budget)),
+                ("bidirectional", Solver(mode="bidirectional", capacity=spec.capacity, time_budget=time_budget))]
+    totals = {name: [0, 0.0] for name, _ in searches}
+    for index in range(boards):
+        board = random_board(rng, spec.num_containers, spec.capacity, spec.colors)
+        print(f"Board {index + 1}:")
+        lengths = set()
+        for name, solver in searches:
+            result = solver.solve(board, colors=spec.colors)
+            length = len(result.moves) if result.found else "-"
+            if result.status in ("solved", "unsolvable"):
+                lengths.add(length)
+            print(f"  {name:<13} {result.status:<10} length={length:<4} stored={result.states_stored:<8} "
+                  f"expanded={result.nodes_expanded:<8} time={result.elapsed:.3f}s")
+            totals[name][0] += result.states_stored
+            totals[name][1] += result.elapsed
+        if len(lengths) > 1:
+            print(f"  MISMATCH: solution lengths {sorted(lengths, key=str)}")
+    print("Totals:")
+    for name, (stored, elapsed) in totals.items():
+        print(f"  {name:<13} stored={stored:<9} time={elapsed:.3f}s")
+
+
+def pruning_report(boards, seed, spec, modes, time_budget):
+    """Expanded states with and without the pruning rules, and how many shuffles the generator rejects."""
+    rng = random.Random(seed)
+    totals = {mode: [0, 0, 0] for mode in modes}
+    for index in range(boards):
+        board = random_board(rng, spec.num_containers, spec.capacity, spec.colors)
+        print(f"Board {index + 1}:")
+        for mode in modes:
+            plain = Solver(mode=mode, capacity=spec.capacity, time_budget=time_budget, prune=False)
+            pruned = Solver(mode=mode, capacity=spec.capacity, time_budget=time_budget, prune=True)
+            before = plain.solve(board, colors=spec.colors)
+            after = pruned.solve(board, colors=spec.colors)
+            print(f"  {mode:<13} {after.status:<10} expanded {before.nodes_expanded:>8} -> {after.nodes_expanded:<8} "
+                  f"moves skipped={after.nodes_pruned:<8} time {before.elapsed:.3f}s -> {after.elapsed:.3f}s")
+            totals[mode][0] += before.nodes_expanded
+            totals[mode][1] += after.nodes_expanded
+            totals[mode][2] += after.nodes_pruned
+    print("Totals:")
+    for mode, (before, after, skipped) in totals.items():
+        print(f"  {mode:<13} expanded {before:>9} -> {after:<9} ({1 - after / max(1, before):.0%} fewer), "
+              f"moves skipped={skipped}")
+
+    rng = random.Random(seed)
+    rejected = sum(generate_solvable_containers(spec, rng)[1] for _ in range(boards))
+    print(f"Generator: rejected {rejected} unsolvable shuffle(s) while making {boards} boards")
+
+
+def run(boards, seed, modes, time_budget):
+    """Every mode, with the original BFS as the baseline."""
+    rng = random.Random(seed)
+    searches = [("original bfs", original_bfs(time_budget=time_budget))]
+    searches += [(mode, Solver(mode=mode, time_budget=time_budget)) for mode in modes]
+    totals = {name: [0, 0.0] for name, _ in searches}
+    for index in range(boards):
+        board = random_board(rng)
+        print(f"Board {index + 1}: {board}")
+        for name, solver in searches:
+            result = solver.solve(board)
+            length = len(result.moves) if result.found else "-"
+            print(f"  {name:<13} {result.status:<10} length={length:<4} "
+                  f"expanded={result.nodes_expanded:<8} time={result.elapsed:.3f}s")
+            totals[name][0] += result.nodes_expanded
+            totals[name][1] += result.elapsed
+    print("Totals:")
+    for name, (expanded, elapsed) in totals.items():
+        print(f"  {name:<13} expanded={expanded:<9} time={elapsed:.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--boards", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--modes", nargs="+", default=list(Solver.MODES), choices=Solver.MODES)
+    parser.add_argument("--time-budget", type=float, default=None)
+    parser.add_argument("--encoding", action="store_true",
+                        help="compare tuple and packed state representations instead")
+    parser.add_argument("--symmetry", action="store_true",
+                        help="compare visited-set sizes with and without symmetry reduction")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="compare bidirectional search with the game's search and BFS")
+    parser.add_argument("--pruning", action="store_true",
+                        help="compare expanded states with and without the pruning rules")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+    if args.pruning:
+        pruning_report(args.boards, args.seed, spec_from_args(parser, args), args.modes, args.time_budget)
+    elif args.bidirectional:
+        bidirectional_report(args.boards, args.seed, spec_from_args(parser, args), args.time_budget)
+    elif args.encoding:
+        encoding_report(random_board(random.Random(args.seed)))
+    elif args.symmetry:
+        symmetry_report(args.boards, args.seed,
+                        [mode for mode in args.modes if mode not in ("idastar", "bidirectional")])
+    else:
+        run(args.boards, args.seed, args.modes, args.time_budget)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Seeded, headless benchmark suite for the solver and the renderer.
+
+Every run solves the same corpus of boards (generated from --seed) with
+ColorSortBoard.find_solution_from_current_state and times ColorSortGame.draw
+offscreen with SDL's dummy drivers.  Each size and the renderer run in a
+fresh process, so peak RSS is measured per section.  Results go to a JSON
+file; --compare checks a new run against an old one and exits with status 1
+when a metric got worse by more than --threshold.
+
+Run from the repository root:
+
+    python -m benchmarks.suite --output before.json
+    python -m benchmarks.suite --output after.json
+    python -m benchmarks.suite --compare before.json after.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from collections import deque
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is reported as null there
+    resource = None
+
+from color_sort_core import ColorSortBoard, PuzzleSpec, generate_solvable_containers
+from solver import Solver
+
+DEFAULT_SIZES = ["4x2x4", "6x2x4", "8x2x4", "10x2x4"]
+
+# Metric name -> True when a larger value is better
+SOLVER_METRICS = {
+    "states_per_sec": True,
+    "latency_mean": False,
+    "latency_p50": False,
+    "latency_p90": False,
+    "latency_max": False,
+    "nodes_expanded": False,
+    "peak_rss_kb": False,
+}
+RENDER_METRICS = {
+    "frame_mean_ms": False,
+    "frame_p50_ms": False,
+    "frame_p95_ms": False,
+    "peak_rss_kb": False,
+}
+
+
+def _peak_rss_kb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == "darwin" else peak  # macOS reports bytes
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def corpus(size, seed, boards):
+    """The fixed boards for one size; board i only depends on the seed, the size and i."""
+    num_colors, empty_containers, capacity = (int(part) for part in size.split("x"))
+    spec = PuzzleSpec(num_colors, empty_containers, capacity)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return spec, [generate_solvable_containers(spec, random.Random(f"{seed}:{size}:{index}"))[0]
+                      for index in range(boards)]
+
+
+def solver_section(size, seed, boards, mode, time_budget, repeat):
+    """Solve the corpus for one size the way the game does; runs in its own process.
+
+    Each board is solved `repeat` times and its fastest time is kept, which
+    filters out most scheduling noise.
+    """
+    spec, containers = corpus(size, seed, boards)
+    board = ColorSortBoard(Solver(mode=mode, capacity=spec.capacity, time_budget=time_budget), spec=spec)
+    latencies = []
+    expanded = 0
+    solved = 0
+    for board_containers in containers:
+        best = float("inf")
+        for _ in range(repeat):
+            board.containers = [deque(container) for container in board_containers]
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                board.find_solution_from_current_state()
+            best = min(best, time.perf_counter() - start)
+        latencies.append(best)
+        expanded += board.last_solve.nodes_expanded
+        solved += board.last_solve.found
+    total = sum(latencies)
+    return {
+        "boards": boards,
+        "solved": solved,
+        "states_per_sec": expanded / total if total else 0.0,
+        "nodes_expanded": expanded,
+        "latency_mean": statistics.mean(latencies),
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p90": _percentile(latencies, 0.9),
+        "latency_max": max(latencies),
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def render_section(seed, frames):
+    """Offscreen ColorSortGame.draw frame times; runs in its own process."""
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    from benchmarks import render_benchmark  # Sets the dummy SDL drivers before pygame starts
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = render_benchmark.setup(seed)
+        render_benchmark.frame_times(game, 10)  # Warm up lazy asset loading
+        times = render_benchmark.frame_times(game, frames)
+        game.hint_worker.set_generation(-1)  # Abandon the background hint search
+    return {
+        "frames": frames,
+        "frame_mean_ms": statistics.mean(times),
+        "frame_p50_ms": _percentile(times, 0.5),
+        "frame_p95_ms": _percentile(times, 0.95),
+        "peak_rss_kb": _peak_rss_kb(),
+    }
+
+
+def run(args):
+    results = {
+        "meta": {
+            "seed": args.seed,
+            "boards": args.boards,
+            "mode": args.mode,
+            "repeat": args.repeat,
+            "sizes": args.sizes,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "solver": {},
+        "render": None,
+    }
+    # A fresh process per section keeps the peak RSS of one size out of the next
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        for size in args.sizes:
+            section = pool.apply(solver_section, (size, args.seed, args.boards, args.mode, args.time_budget,
+                                                     args.repeat))
+            results["solver"][size] = section
+            print(f"{size:<8} {section['solved']}/{section['boards']} solved  "
+                  f"{section['states_per_sec']:>9.0f} states/s  "
+                  f"latency p50 {section['latency_p50'] * 1000:8.2f} ms  p90 {section['latency_p90'] * 1000:8.2f} ms  "
+                  f"max {section['latency_max'] * 1000:8.2f} ms  peak RSS {section['peak_rss_kb']} KB")
+        if args.frames:
+            section = pool.apply(render_section, (args.seed, args.frames))
+            results["render"] = section
+            print(f"render   {section['frames']} frames  mean {section['frame_mean_ms']:.3f} ms  "
+                  f"p50 {section['frame_p50_ms']:.3f} ms  p95 {section['frame_p95_ms']:.3f} ms  "
+                  f"peak RSS {section['peak_rss_kb']} KB")
+    with open(args.output, "w") as output:
+        json.dump(results, output, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def _compare_section(name, old, new, metrics, threshold):
+    regressions = []
+    for metric, higher_is_better in metrics.items():
+        before, after = old.get(metric), new.get(metric)
+        if not before or after is None:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        flag = "REGRESSION" if worse > threshold else ("improved" if worse < -threshold else "")
+        print(f"  {name:<8} {metric:<15} {before:>14.4f} -> {after:<14.4f} {change:+7.1%}  {flag}")
+        if flag == "REGRESSION":
+            regressions.append(f"{name} {metric}")
+    return regressions
+
+
+def compare(old_path, new_path, threshold):
+    """Print every metric of two runs side by side; returns the regressed metric names."""
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+    if old["meta"]["seed"] != new["meta"]["seed"] or old["meta"]["boards"] != new["meta"]["boards"]:
+        print("Warning: the runs used different corpora (seed or board count differ)")
+    regressions = []
+    for size in old["solver"]:
+        if size in new["solver"]:
+            regressions += _compare_section(size, old["solver"][size], new["solver"][size], SOLVER_METRICS, threshold)
+    if old["render"] and new["render"]:
+        regressions += _compare_section("render", old["render"], new["render"], RENDER_METRICS, threshold)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--boards", type=int, default=20, help="boards per size")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="COLORSxEMPTYxCAPACITY")
+    parser.add_argument("--mode", default="astar", choices=Solver.MODES)
+    parser.add_argument("--time-budget", type=float, default=60.0, help="seconds allowed per board")
+    parser.add_argument("--repeat", type=int, default=3, help="solves per board; the fastest one counts")
+    parser.add_argument("--frames", type=int, default=300, help="frames to draw, 0 to skip the renderer")
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files instead")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="relative change counted as a regression (default 0.10)")
+    args = parser.parse_args()
+    if args.compare:
+        regressions = compare(*args.compare, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("No regressions.")
+        return
+    for size in args.sizes:
+        try:
+            num_colors, empty_containers, capacity = (int(part) for part in size.split("x"))
+            PuzzleSpec(num_colors, empty_containers, capacity)
+        except ValueError as error:
+            parser.error(f"bad size {size!r}: {error}")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
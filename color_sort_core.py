@@ -0,0 +1,270 @@
+"""Board model and solver glue for the Color Sort game, without pygame.
+
+Importing this module opens no window and touches no audio device, so the
+rules and the solver can be used from scripts, batch jobs and tests.  Run it
+directly to generate and solve a board headlessly:
+
+    python color_sort_core.py --seed 42
+"""
+import argparse
+import random
+from collections import deque
+
+from packed_state import StateCodec
+from solver import Solver, apply_move
+
+# Board parameters
+NUM_CONTAINERS = 6
+BALLS_PER_CONTAINER = 4
+# Ball colors in the order new colors are added to larger boards
+PALETTE = ['red', 'blue', 'green', 'yellow', 'orange', 'purple',
+           'cyan', 'pink', 'brown', 'gray', 'lime', 'navy',
+           'magenta', 'teal', 'olive', 'maroon']
+COLORS = PALETTE[:4]
+# A new board gets a quick search of at most this many states to weed out unsolvable shuffles
+SOLVABILITY_CHECK_NODES = 100_000
+GENERATION_ATTEMPTS = 100
+# Inverse moves per ball when scrambling a sorted board instead (see scrambled_containers)
+SCRAMBLE_MOVES_PER_BALL = 4
+
+
+def generate_containers(rng=random, num_containers=NUM_CONTAINERS, capacity=BALLS_PER_CONTAINER, colors=COLORS):
+    """Shuffle `capacity` balls of every color into full containers, leaving the rest empty.
+
+    `rng` is anything with a shuffle() method: the random module or a seeded random.Random.
+    """
+    ball_pool = []
+    for color in colors:
+        ball_pool.extend([color] * capacity)
+    rng.shuffle(ball_pool)
+    containers = []
+    for _ in range(len(colors)):
+        containers.append(ball_pool[:capacity])
+        ball_pool = ball_pool[capacity:]
+    for _ in range(num_containers - len(colors)):
+        containers.append([])
+    rng.shuffle(containers)
+    return containers
+
+
+def scrambled_containers(spec, rng=random):
+    """Scramble a sorted board with random inverse moves, so the result is always solvable.
+
+    Used when shuffles keep coming out unsolvable, e.g. with one empty container.
+    """
+    codec = StateCodec(spec.num_containers, spec.capacity, spec.colors)
+    sorted_board = [[color] * spec.capacity for color in spec.colors] + [[] for _ in range(spec.empty_containers)]
+    rng.shuffle(sorted_board)
+    code = codec.encode(sorted_board)
+    last_move = None
+    for _ in range(spec.num_colors * spec.capacity * SCRAMBLE_MOVES_PER_BALL):
+        # Don't step straight back to the board we just left
+        previous = [(from_idx, to_idx, before) for from_idx, to_idx, before in codec.predecessors(code)
+                    if (to_idx, from_idx) != last_move]
+        if not previous:
+            break
+        from_idx, to_idx, code = rng.choice(previous)
+        last_move = (from_idx, to_idx)
+    return [list(container) for container in codec.decode(code)]
+
+
+def generate_solvable_containers(spec, rng=random, attempts=GENERATION_ATTEMPTS, mode="weighted"):
+    """Shuffle boards for `spec` until one is not provably unsolvable; returns (containers, rejected, check).
+
+    Each board gets a `mode` search capped at SOLVABILITY_CHECK_NODES states;
+    `check` is its SolveResult, so a caller solving with the same mode can
+    reuse a solution the check already found.  A board the check can't
+    decide within the cap is kept.  When every shuffle is unsolvable, a
+    scrambled sorted board is returned instead, with `check` None.
+    """
+    checker = Solver(mode=mode, capacity=spec.capacity, max_nodes=SOLVABILITY_CHECK_NODES)
+    for rejected in range(attempts):
+        containers = spec.generate(rng)
+        check = checker.solve(containers, colors=spec.colors)
+        if check.status != "unsolvable":
+            return containers, rejected, check
+    print(f"No solvable shuffle for {spec} in {attempts} attempts; scrambling a sorted board.")
+    return scrambled_containers(spec, rng), attempts, None
+
+
+class PuzzleSpec:
+    """Size of a puzzle: one full container per color, some empty ones, and the capacity.
+
+    Colors are the first `num_colors` entries of `palette`.
+    """
+
+    def __init__(self, num_colors=len(COLORS), empty_containers=NUM_CONTAINERS - len(COLORS),
+                 capacity=BALLS_PER_CONTAINER, palette=PALETTE):
+        if not 1 <= num_colors <= len(palette):
+            raise ValueError(f"Number of colors must be between 1 and {len(palette)}, got {num_colors}")
+        if empty_containers < 1:
+            raise ValueError(f"At least one empty container is needed to move any ball, got {empty_containers}")
+        if capacity < 1:
+            raise ValueError(f"Capacity must be at least 1, got {capacity}")
+        self.num_colors = num_colors
+        self.empty_containers = empty_containers
+        self.capacity = capacity
+        self.colors = tuple(palette[:num_colors])
+
+    @classmethod
+    def from_containers(cls, num_containers, num_colors, capacity=BALLS_PER_CONTAINER):
+        """Spec for a total container count instead of a number of empty containers."""
+        return cls(num_colors, num_containers - num_colors, capacity)
+
+    @property
+    def num_containers(self):
+        return self.num_colors + self.empty_containers
+
+    def generate(self, rng=random):
+        return generate_containers(rng, self.num_containers, self.capacity, self.colors)
+
+    def __eq__(self, other):
+        return isinstance(other, PuzzleSpec) and (self.colors, self.empty_containers, self.capacity) == \
+            (other.colors, other.empty_containers, other.capacity)
+
+    def __hash__(self):
+        return hash((self.colors, self.empty_containers, self.capacity))
+
+    def __repr__(self):
+        return (f"PuzzleSpec(num_colors={self.num_colors}, empty_containers={self.empty_containers}, "
+                f"capacity={self.capacity})")
+
+
+DEFAULT_SPEC = PuzzleSpec()
+
+
+class ColorSortBoard:
+    """The containers, the move rules and the cached solution for one game."""
+
+    def __init__(self, solver=None, rng=random, spec=DEFAULT_SPEC):
+        self.rng = rng
+        self.spec = spec
+        self.solver = solver if solver is not None else Solver(mode="astar", capacity=spec.capacity)
+        if self.solver.capacity != spec.capacity:
+            raise ValueError(f"Solver capacity {self.solver.capacity} doesn't match the puzzle capacity {spec.capacity}")
+        self.containers = []
+        self.solution = []
+        self.solution_start = None  # Board the cached solution starts from
+        self.solution_states = {}  # Every board on the cached solution path -> index of its next move
+        self.hint_counter = 0
+        self.is_solution_ready = False
+        self.rejected_boards = 0  # Unsolvable shuffles thrown away by the generator
+        self.last_solve = None  # SolveResult of the latest search, for stats and debugging
+
+    def new_board(self):
+        self.load_state(self._generate_containers(randomize_style="random_distribution"))
+
+    def load_state(self, state):
+        """Put a given board in play, dropping the cached solution."""
+        self.containers = [deque(container) for container in state]
+        self.solution = []
+        self.solution_start = None
+        self.solution_states = {}
+        self.hint_counter = 0
+        self.is_solution_ready = False
+
+    def _generate_containers(self, randomize_style="random_distribution"):
+        print("Generating random containers.")
+        containers, rejected, _ = generate_solvable_containers(self.spec, self.rng)
+        if rejected:
+            self.rejected_boards += rejected
+            print(f"Rejected {rejected} unsolvable board(s).")
+        return [deque(container) for container in containers]
+
+    def move_ball(self, from_idx, to_idx):
+        if from_idx == to_idx or not self.containers[from_idx]:
+            return False
+
+        if len(self.containers[to_idx]) >= self.spec.capacity:
+            return False
+
+        if not self.containers[to_idx] or self.containers[from_idx][-1] == self.containers[to_idx][-1]:
+            self.containers[to_idx].append(self.containers[from_idx].pop())
+            return True
+        return False
+
+    def is_solved(self, containers):
+        for container in containers:
+            if len(container) > 0:
+                if len(container) != self.spec.capacity or len(set(container)) > 1:
+                    return False
+        return True
+
+    def make_move(self, state, from_idx, to_idx):
+        return apply_move(state, from_idx, to_idx, self.spec.capacity)
+
+    def _current_state(self):
+        return tuple(tuple(container) for container in self.containers)
+
+    def find_solution_from_current_state(self):
+        initial_state = self._current_state()
+        self._apply_solve_result(self.solver.solve(initial_state, colors=self.spec.colors), initial_state)
+
+    def _apply_solve_result(self, result, state):
+        self.last_solve = result
+        if result.found:
+            self.solution = result.moves
+            self.solution_start = state
+            self.hint_counter = 0
+            self.is_solution_ready = True
+            # Remember every board along the path so later hints are a dictionary lookup
+            self.solution_states = {state: 0}
+            for index, (from_idx, to_idx) in enumerate(self.solution):
+                state = self.make_move(state, from_idx, to_idx)
+                self.solution_states[state] = index + 1
+            source = "from cache" if result.cache_hit else f"{result.nodes_expanded} states expanded"
+            print(f"Solution found ({len(result.moves)} moves, {source}).")
+            return
+        self.solution = []
+        self.solution_start = None
+        self.solution_states = {}
+        self.is_solution_ready = False
+        if result.status == "exhausted":
+            print(f"Search exhausted after {result.nodes_expanded} states.")
+        elif result.status == "timeout":
+            print(f"Search timed out after {result.nodes_expanded} states.")
+        else:
+            print("No solution found.")
+
+
+def add_spec_arguments(parser):
+    """Board size options shared by the command-line tools."""
+    parser.add_argument("--colors", type=int, default=DEFAULT_SPEC.num_colors,
+                        help=f"ball colors, one full container each (max {len(PALETTE)})")
+    parser.add_argument("--empty", type=int, default=DEFAULT_SPEC.empty_containers, help="empty containers")
+    parser.add_argument("--capacity", type=int, default=DEFAULT_SPEC.capacity, help="balls per container")
+
+
+def spec_from_args(parser, args):
+    try:
+        return PuzzleSpec(args.colors, args.empty, args.capacity)
+    except ValueError as error:
+        parser.error(str(error))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate and solve a Color Sort board without a display.")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the board generator")
+    parser.add_argument("--mode", default="astar", choices=Solver.MODES)
+    parser.add_argument("--time-budget", type=float, default=None, help="seconds before the search gives up")
+    parser.add_argument("--metrics", action="store_true", help="print the solver metrics as JSON")
+    add_spec_arguments(parser)
+    args = parser.parse_args()
+    spec = spec_from_args(parser, args)
+
+    rng = random.Random(args.seed) if args.seed is not None else random
+    board = ColorSortBoard(Solver(mode=args.mode, capacity=spec.capacity, time_budget=args.time_budget), rng, spec)
+    board.new_board()
+    for index, container in enumerate(board.containers):
+        print(f"Container {index + 1}: {', '.join(container) or '(empty)'}")
+    board.find_solution_from_current_state()
+    for i, (from_idx, to_idx) in enumerate(board.solution):
+        print(f"{i+1}. Move ball from container {from_idx+1} to container {to_idx+1}")
+    if args.metrics:
+        import json
+
+        print(json.dumps(board.last_solve.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
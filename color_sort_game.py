@@ -1,55 +1,136 @@
+import argparse
+import os
 import pygame
 import random
-import threading
+import time
 from collections import deque
-from multiprocessing import Process
+from multiprocessing import Pipe, Process
+
+from color_sort_core import DEFAULT_SPEC, ColorSortBoard, add_spec_arguments, spec_from_args
+from hint_worker import HintWorker
+from replay_log import Replay, ReplayWriter
+from solution_cache import SolutionCache, pack_moves
+from solver import Solver
 
 # Game parameters
 SCREEN_WIDTH = 900
 SCREEN_HEIGHT = 700
-CONTAINER_WIDTH = 100
+CONTAINER_WIDTH = 100  # Largest container width; boards with many containers get narrower ones
 CONTAINER_HEIGHT = 350
-BALL_RADIUS = 15
-NUM_CONTAINERS = 6
-BALLS_PER_CONTAINER = 4
+BALL_RADIUS = 15  # Largest ball radius; shrinks with narrow or tall containers
+BOARD_WIDTH = SCREEN_WIDTH - 180  # Room for the containers, left of the buttons
 BUTTON_RADIUS = 40
 BUTTON_MARGIN = 90
 BUTTON_VERTICAL_SPACING = 120
 BUTTON_VERTICAL_OFFSET = 30
-COLORS = ['red', 'blue', 'green', 'yellow']
 COLOR_MAP = {
     'red': (255, 0, 0),
     'blue': (0, 0, 255),
     'green': (0, 255, 0),
-    'yellow': (255, 255, 0)
+    'yellow': (255, 255, 0),
+    'orange': (255, 140, 0),
+    'purple': (128, 0, 128),
+    'cyan': (0, 255, 255),
+    'pink': (255, 150, 200),
+    'brown': (139, 69, 19),
+    'gray': (128, 128, 128),
+    'lime': (170, 255, 80),
+    'navy': (0, 0, 110),
+    'magenta': (255, 0, 255),
+    'teal': (0, 128, 128),
+    'olive': (128, 128, 0),
+    'maroon': (110, 0, 0),
 }
+DEBUG_OVERLAY_RECT = pygame.Rect(SCREEN_WIDTH - 330, 85, 320, 70)  # F3 toggles frame and solver stats here
+DEBUG_OVERLAY_REFRESH = 0.5  # Seconds between frame time updates on the overlay, so it doesn't redraw every frame
+LARGE_BOARD_BALLS = 48  # Bigger boards get hints from weighted A*: near-optimal, but much faster
+SOLVER_MAX_MEMORY = 512 * 1024 * 1024  # Bytes the hint search may use before giving up
+HINT_TIME_BUDGET = 10.0  # Seconds the hint search may take before giving up
+SOLUTION_CACHE_PATH = "solution_cache.sqlite3"  # Solved boards are remembered across sessions
+SOLVER_DONE_EVENT = pygame.USEREVENT + 1  # Wakes the idle main loop when a hint search finishes
+
+# Pygame, the window and the audio device are set up by main(), so importing
+# this module stays cheap; sounds and images are loaded the first time they're used.
+screen = None
+clock = None
+_assets = {}
+
+def load_sound(path):
+    """Load a sound effect on first use."""
+    if path not in _assets:
+        _assets[path] = pygame.mixer.Sound(path)
+    return _assets[path]
+
+def load_image(path, size):
+    """Load an image scaled to `size` on first use."""
+    key = (path, size)
+    if key not in _assets:
+        image = pygame.transform.scale(pygame.image.load(path), size)
+        if pygame.display.get_surface() is not None:
+            image = image.convert()  # Match the display format so blits are cheap
+        _assets[key] = image
+    return _assets[key]
+
+class RenderCache:
+    """Fonts, text, button faces and ball sprites built once and reused every frame."""
 
-# Initialize Pygame
-pygame.init()
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Color Sort Game!")
-clock = pygame.time.Clock()
-
-# Initialize Pygame mixer for sound effects
-pygame.mixer.init()
-
-# Load sound effects
-move_sound = pygame.mixer.Sound("move.wav")
-win_sound = pygame.mixer.Sound("win.wav")
-click_sound = pygame.mixer.Sound("click.wav")
-hidden_click_sound = pygame.mixer.Sound("hidden_click.wav")  # New sound for the hidden button
-pygame.mixer.music.load("background_music.mp3")
-pygame.mixer.music.play(-1, 0.0)  # Play background music indefinitely
-
-# Adjust the volume of the background music (set it to 30% of the max volume)
-pygame.mixer.music.set_volume(0.25)
-
-# Load the background image
-background_image = pygame.image.load('background.png')  # Replace with your image file path
-background_image = pygame.transform.scale(background_image, (SCREEN_WIDTH, SCREEN_HEIGHT))  # Scale to fit the screen
-
-def draw_gradient_circle(x, y, radius, color_start, color_end, clicked=False):
+    def __init__(self):
+        self.fonts = {}
+        self.texts = {}
+        self.buttons = {}
+        self.balls = {}
+        self.containers = {}
+        self.dynamic = {}  # Slot name -> (text, surface) for text that changes now and then
+
+    def font(self, size):
+        if size not in self.fonts:
+            self.fonts[size] = pygame.font.Font(None, size)
+        return self.fonts[size]
+
+    def text(self, text, size, color):
+        """Rendered static text; rendered once per (text, size, color)."""
+        key = (text, size, color)
+        if key not in self.texts:
+            self.texts[key] = self.font(size).render(text, True, color)
+        return self.texts[key]
+
+    def dynamic_text(self, slot, text, size, color):
+        """Rendered text for a slot whose value changes; re-rendered only when it does."""
+        cached = self.dynamic.get(slot)
+        if cached is None or cached[0] != text:
+            cached = self.dynamic[slot] = (text, self.font(size).render(text, True, color))
+        return cached[1]
+
+    def button(self, radius, color_start, color_end, clicked=False):
+        """Pre-baked gradient button face, blitted with its top-left at (x - radius, y - radius)."""
+        key = (radius, color_start, color_end, clicked)
+        if key not in self.buttons:
+            surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            draw_gradient_circle(radius, radius, radius, color_start, color_end, clicked, surface)
+            self.buttons[key] = surface
+        return self.buttons[key]
+
+    def container(self, selected, width=CONTAINER_WIDTH):
+        """Container body with its border, light gray while selected."""
+        key = (selected, width)
+        if key not in self.containers:
+            surface = pygame.Surface((width, CONTAINER_HEIGHT))
+            surface.fill((211, 211, 211) if selected else (255, 255, 255))
+            pygame.draw.rect(surface, (0, 0, 0), (0, 0, width, CONTAINER_HEIGHT), 2)
+            self.containers[key] = surface
+        return self.containers[key]
+
+    def ball(self, color_rgb, radius=BALL_RADIUS):
+        key = (color_rgb, radius)
+        if key not in self.balls:
+            surface = pygame.Surface((radius * 2, radius * 2), pygame.SRCALPHA)
+            pygame.draw.circle(surface, color_rgb, (radius, radius), radius)
+            self.balls[key] = surface
+        return self.balls[key]
+
+def draw_gradient_circle(x, y, radius, color_start, color_end, clicked=False, surface=None):
     """Draws a circular button with a gradient effect from color_start to color_end, with click effect."""
+    surface = surface if surface is not None else screen
     for i in range(radius):
         blend_ratio = i / radius
         blended_color = (
@@ -59,7 +140,7 @@ def draw_gradient_circle(x, y, radius, color_start, color_end, clicked=False):
         )
         if clicked:
             blended_color = tuple(max(0, c - 50) for c in blended_color)
-        pygame.draw.circle(screen, blended_color, (x, y), radius - i)
+        pygame.draw.circle(surface, blended_color, (x, y), radius - i)
 
 def show_confetti():
     """Show confetti effect after winning."""
@@ -68,55 +149,150 @@ def show_confetti():
         y = random.randint(0, SCREEN_HEIGHT)
         color = random.choice([(255, 0, 0), (0, 255, 0), (0, 0, 255)])
         pygame.draw.circle(screen, color, (x, y), 5)
-    pygame.display.flip()
+
+class SolutionView:
+    """Scrollable list of solution moves that renders only the rows on screen.
+
+    `moves` is the packed move list (two bytes per move), read row by row, so a
+    solution of any length is never expanded into Python objects.
+    """
+    line_height = 30  # Height for each line of text
+    top_margin = 60  # Space for the title
+    footer_height = 40  # Space for the position line
+    row_cache_size = 256  # Rendered rows kept around for scrolling back
+
+    def __init__(self, moves, height):
+        self.moves = moves
+        self.count = len(moves) // 2
+        self.visible_rows = max(1, (height - self.top_margin - self.footer_height) // self.line_height)
+        self.first_row = 0
+        self.font = pygame.font.Font(None, 36)
+        self.rows = {}
+
+    def scroll(self, rows):
+        last_first_row = max(0, self.count - self.visible_rows)
+        first_row = min(max(0, self.first_row + rows), last_first_row)
+        changed = first_row != self.first_row
+        self.first_row = first_row
+        return changed
+
+    def row(self, index):
+        surface = self.rows.get(index)
+        if surface is None:
+            if len(self.rows) >= self.row_cache_size:
+                # Keep only the rows near the current page
+                near = range(self.first_row - self.visible_rows, self.first_row + 2 * self.visible_rows)
+                self.rows = {i: row for i, row in self.rows.items() if i in near}
+            from_idx, to_idx = self.moves[2 * index], self.moves[2 * index + 1]
+            text = f"{index+1}. Move ball from container {from_idx+1} to container {to_idx+1}"
+            surface = self.rows[index] = self.font.render(text, True, (0, 0, 0))
+        return surface
+
+    def draw(self, surface, background, title):
+        surface.blit(background, (0, 0))
+        surface.blit(title, (20, 20))
+        last_row = min(self.count, self.first_row + self.visible_rows)
+        for i in range(self.first_row, last_row):
+            surface.blit(self.row(i), (20, self.top_margin + (i - self.first_row) * self.line_height))
+        if self.count > self.visible_rows:
+            position = self.font.render(f"Moves {self.first_row + 1}-{last_row} of {self.count}  (arrows, PgUp/PgDn, wheel)", True, (80, 80, 80))
+            surface.blit(position, (20, surface.get_height() - self.footer_height + 10))
 
 # Solution window with dynamic height
-def display_solution_window(solution):
+def display_solution_window(connection):
+    """Child-process entry point; the packed move list arrives over `connection`."""
+    moves = connection.recv_bytes()
+    connection.close()
     pygame.init()
 
     # Calculate the required height for the solution window based on the number of moves
-    line_height = 30  # Height for each line of text
     padding = 100     # Extra space for the title and padding
-    window_height = min(800, len(solution) * line_height + padding)  # Cap max height at 800
+    window_height = min(800, len(moves) // 2 * SolutionView.line_height + padding)  # Cap max height at 800
 
     solution_screen = pygame.display.set_mode((600, window_height))
     pygame.display.set_caption("Solution")
 
     # Load and scale the background to match the solution window
-    background = pygame.transform.scale(pygame.image.load('background.png'), (600, window_height))
-    font = pygame.font.Font(None, 36)
-    
+    background = load_image('background.png', (600, window_height))
+    view = SolutionView(moves, window_height)
+    title_text = view.font.render("Full Solution", True, (0, 0, 0))
+    page = view.visible_rows
+    scroll_keys = {pygame.K_UP: -1, pygame.K_DOWN: 1, pygame.K_PAGEUP: -page, pygame.K_PAGEDOWN: page,
+                   pygame.K_HOME: -view.count, pygame.K_END: view.count}
+
     running = True
+    redraw = True
     while running:
-        solution_screen.blit(background, (0, 0))
-        title_text = font.render("Full Solution", True, (0, 0, 0))
-        solution_screen.blit(title_text, (20, 20))
-        
-        # Display each move in the solution
-        for i, (from_idx, to_idx) in enumerate(solution):
-            move_text = font.render(f"{i+1}. Move ball from container {from_idx+1} to container {to_idx+1}", True, (0, 0, 0))
-            solution_screen.blit(move_text, (20, 60 + i * line_height))
-
-        # Close the solution window on quit or 'Esc' key
-        for event in pygame.event.get():
+        if redraw:
+            view.draw(solution_screen, background, title_text)
+            pygame.display.flip()
+            redraw = False
+
+        # Nothing changes on its own, so sleep until the next input event
+        for event in [pygame.event.wait()] + pygame.event.get():
+            # Close the solution window on quit or 'Esc' key
             if event.type == pygame.QUIT:
                 print("Solution window closed.")
                 running = False
             elif event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
                 print("Solution window closed via ESC key.")
                 running = False
-
-        pygame.display.flip()
+            elif event.type == pygame.KEYDOWN and event.key in scroll_keys:
+                redraw |= view.scroll(scroll_keys[event.key])
+            elif event.type == pygame.MOUSEWHEEL:
+                redraw |= view.scroll(-3 * event.y)
+            elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+                redraw = True
     pygame.quit()
 
 def open_solution_window(solution):
     print("Opening solution window.")
-    process = Process(target=display_solution_window, args=(solution,))
+    # The moves go over a pipe as packed bytes rather than as pickled Process arguments
+    receiver, sender = Pipe(duplex=False)
+    process = Process(target=display_solution_window, args=(receiver,))
     process.start()
-
-class ColorSortGame:
-    def __init__(self):
-        self.reset_game()
+    receiver.close()
+    sender.send_bytes(pack_moves(solution))
+    sender.close()
+
+def merge_overlapping(rects):
+    """Join overlapping rects until none overlap, so no pixel is painted twice in a frame."""
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        overlapping = rect.collidelistall(merged)
+        while overlapping:
+            for index in reversed(overlapping):
+                rect.union_ip(merged.pop(index))
+            overlapping = rect.collidelistall(merged)
+        merged.append(rect)
+    return merged
+
+class ColorSortGame(ColorSortBoard):
+    def __init__(self, spec=DEFAULT_SPEC, rng=random, deal=True, cache_path=SOLUTION_CACHE_PATH):
+        # Cap the search so a hard board gives up instead of exhausting memory
+        self.solution_cache = SolutionCache(cache_path)
+        mode = "astar" if spec.num_colors * spec.capacity <= LARGE_BOARD_BALLS else "weighted"
+        super().__init__(Solver(mode=mode, capacity=spec.capacity, max_memory=SOLVER_MAX_MEMORY,
+                                time_budget=HINT_TIME_BUDGET, cache=self.solution_cache), rng, spec)
+        # Searches run on a worker thread so the main loop keeps rendering
+        self.hint_worker = HintWorker(self.solver, colors=spec.colors, on_result=self._post_solver_done)
+        self.drawn_views = {}  # What each screen region showed when it was last drawn
+        self.full_redraw = True  # Set when everything must be redrawn (first frame, restart)
+        self.render_stats = {"frames_drawn": 0, "frames_skipped": 0, "full_redraws": 0, "damaged_area": 0,
+                             "last_frame_ms": 0.0}
+        self.debug_overlay = False
+        self.shown_frame_ms = 0.0  # Frame time on the overlay, refreshed every DEBUG_OVERLAY_REFRESH seconds
+        self.shown_frame_ms_at = 0.0
+        self.board_generation = 0  # Bumped on every board change to cancel stale searches
+        self.solving_generation = None  # Generation of the search in flight, if any
+        self.hint_requested = False
+        self.record_dir = None  # Directory for replay logs; None disables recording
+        self.seed = None  # Board generator seed, stored in replay logs
+        self.boards_played = 0
+        self.replay_writer = None
+        self.dealing = False  # True while the worker shuffles a new board; input is ignored meanwhile
+        self.containers = [deque() for _ in range(spec.num_containers)]  # Empty until the first deal
         self.selected_container = None
         self.solution = []
         self.hint_counter = 0
@@ -128,9 +304,15 @@ class ColorSortGame:
         self.sound_played = False  # To ensure the win sound plays only once
         self.move_count = 0  # Tracks the number of moves
         self.sound_on = True  # Sound is on by default
-        self.sound_button_font = pygame.font.Font(None, 20)  # Smaller font for the button text
+        self.render_cache = RenderCache()
+
+        # Containers shrink to fit the board width; balls shrink to fit the containers
+        self.container_spacing = min(CONTAINER_WIDTH + 20, BOARD_WIDTH // spec.num_containers)
+        self.container_width = self.container_spacing - max(4, self.container_spacing // 6)
+        self.ball_spacing = (CONTAINER_HEIGHT - 20) // spec.capacity
+        self.ball_radius = max(2, min(BALL_RADIUS, self.container_width // 2 - 4, self.ball_spacing // 2 - 1))
 
-        self.button_x = NUM_CONTAINERS * (CONTAINER_WIDTH + 20) + BUTTON_MARGIN
+        self.button_x = spec.num_containers * self.container_spacing + BUTTON_MARGIN
         self.hint_button_y = SCREEN_HEIGHT // 2 - CONTAINER_HEIGHT // 2 + BUTTON_VERTICAL_OFFSET
         self.restart_button_y = self.hint_button_y + BUTTON_VERTICAL_SPACING
         self.sound_button_radius = 22  # Smaller radius for the sound button
@@ -145,85 +327,231 @@ class ColorSortGame:
         self.fadeout_timer = 0  # Timer to track how long the fade-out has been running
         self.fade_duration = 1500  # 1.5 seconds fade-out duration
         pygame.mixer.music.set_volume(self.initial_volume)  # Set initial volume to 25%
+        if deal:  # Without a deal the board stays empty until load_replay()
+            self.reset_game()
 
 
 
     def reset_game(self):
         print("Resetting game.")
-        self.containers = self._generate_containers(randomize_style="random_distribution")
+        self.full_redraw = True
         self.selected_container = None
         self.solution = []
-        self.hint_counter = 0
-        self.hint_text = ""
         self.is_solution_ready = False
         self.game_won = False
         self.sound_played = False  # Reset the sound flag on game reset
-        threading.Thread(target=self.find_solution_from_current_state).start()
+        self._board_changed()
+        # Shuffling and its solvability check run on the worker thread; update() picks up the board
+        self.dealing = True
+        self.hint_text = "Shuffling..."
+        self.hint_worker.deal(self.board_generation, self.spec, self.rng)
         self.move_count = 0  # Reset move counter on game reset
 
-    def _generate_containers(self, randomize_style="random_distribution"):
-        print("Generating random containers.")
-        ball_pool = []
-        for color in COLORS:
-            ball_pool.extend([color] * BALLS_PER_CONTAINER)
-        random.shuffle(ball_pool)
-        containers = []
-        for _ in range(NUM_CONTAINERS - 2):
-            container = deque(ball_pool[:BALLS_PER_CONTAINER])
-            ball_pool = ball_pool[BALLS_PER_CONTAINER:]
-            containers.append(container)
-        containers.append(deque())
-        containers.append(deque())
-        random.shuffle(containers)
-        return containers
+    def _board_dealt(self, state, result, rejected):
+        self.dealing = False
+        self.full_redraw = True
+        if state is None:
+            self.hint_text = "Couldn't shuffle a new board."
+            return
+        self.load_state(state)
+        self.rejected_boards += rejected
+        self.boards_played += 1
+        self._start_replay()
+        self.hint_text = ""
+        if result is not None:
+            self._apply_solve_result(result, state)  # The solvability check already solved it
+        else:
+            self._request_solution()  # Precompute the solution in the background
+
+    def wait_for_board(self):
+        """Block until the board being shuffled is dealt; for scripts and benchmarks."""
+        while self.dealing:
+            self.update()
+            time.sleep(0.001)
+
+    @classmethod
+    def from_replay(cls, path, index=None, rng=random):
+        """A game for the spec of a replay log, at its position after `index` moves."""
+        replay = Replay(path)
+        game = cls(replay.spec, rng, deal=False)
+        game.load_replay(replay, index)
+        return game
+
+    def load_replay(self, replay, index=None):
+        """Restore a logged position (the last one by default) and hand it to the solver."""
+        if replay.spec != self.spec:
+            raise ValueError(f"Replay is for {replay.spec}, this game plays {self.spec}")
+        index = len(replay) if index is None else index
+        self.load_state(replay.state_at(index))
+        self.dealing = False
+        print(f"Loaded move {index} of {len(replay)} from {replay.path}.")
+        self.full_redraw = True
+        self.selected_container = None
+        self.hint_text = ""
+        self.game_won = self.is_solved(self.containers)
+        self.sound_played = self.game_won
+        self.move_count = index
+        self._board_changed()
+        self._request_solution()
+        self._start_replay()  # Keep recording from the restored position
+
+    def start_recording(self, directory, seed=None):
+        """Log this and every later board to `directory`."""
+        os.makedirs(directory, exist_ok=True)
+        self.record_dir = directory
+        self.seed = seed
+        if not self.dealing and any(self.containers):
+            self._start_replay()  # Otherwise the log starts when the board being shuffled is dealt
+
+    def _start_replay(self):
+        if self.replay_writer is not None:
+            self.replay_writer.close()
+            self.replay_writer = None
+        if self.record_dir is not None:
+            path = os.path.join(self.record_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{self.boards_played}.csreplay")
+            self.replay_writer = ReplayWriter(path, self.spec, self.containers, self.seed, self.boards_played)
+            print(f"Recording to {path}.")
+
+    def container_rect(self, index):
+        x = index * self.container_spacing + 50
+        y = SCREEN_HEIGHT // 2 - CONTAINER_HEIGHT // 2
+        return pygame.Rect(x, y, self.container_width, CONTAINER_HEIGHT)
+
+    def _regions(self):
+        """(name, rect, view) for every screen region that can change; a region is
+        redrawn when its view differs from the one drawn last time."""
+        regions = [(("container", i), self.container_rect(i), (tuple(container), self.selected_container == i))
+                   for i, container in enumerate(self.containers)]
+        size = 2 * BUTTON_RADIUS
+        regions.append(("hint_button", pygame.Rect(self.button_x - BUTTON_RADIUS, self.hint_button_y - BUTTON_RADIUS, size, size),
+                        self.hint_button_pressed))
+        regions.append(("restart_button", pygame.Rect(self.button_x - BUTTON_RADIUS, self.restart_button_y - BUTTON_RADIUS, size, size),
+                        self.restart_button_pressed))
+        size = 2 * self.sound_button_radius
+        regions.append(("sound_button", pygame.Rect(self.sound_button_x - self.sound_button_radius,
+                                                    self.sound_button_y - self.sound_button_radius, size, size),
+                        self.sound_on))
+        regions.append(("hint_line", pygame.Rect(0, SCREEN_HEIGHT - 85, SCREEN_WIDTH, 40), self.hint_text))
+        label_y = self.restart_button_y + BUTTON_RADIUS + 20
+        regions.append(("move_counter", pygame.Rect(self.button_x - 40, label_y - 5, 120, 70), self.move_count))
+        regions.append(("debug_overlay", DEBUG_OVERLAY_RECT, self._debug_lines() if self.debug_overlay else None))
+        return regions
+
+    def is_animating(self):
+        """True while something moves on its own (the flashing win message and confetti)."""
+        return self.game_won
+
+    def render(self):
+        """Redraw only the regions that changed and return their rects for display.update()."""
+        now = time.perf_counter()
+        if now - self.shown_frame_ms_at >= DEBUG_OVERLAY_REFRESH:
+            self.shown_frame_ms = self.render_stats["last_frame_ms"]
+            self.shown_frame_ms_at = now
+        views = {}
+        dirty = []
+        for name, rect, view in self._regions():
+            views[name] = view
+            if self.drawn_views.get(name) != view:
+                dirty.append(rect)
+        self.drawn_views = views
+
+        stats = self.render_stats
+        if self.full_redraw or self.is_animating():
+            self.full_redraw = False
+            dirty = [screen.get_rect()]
+            stats["full_redraws"] += 1
+        if not dirty:
+            stats["frames_skipped"] += 1
+            return []
+
+        # Draw every layer in order once per damaged area, clipped so only its pixels change
+        start = time.perf_counter()
+        dirty = merge_overlapping(dirty)
+        for rect in dirty:
+            screen.set_clip(rect)
+            self.draw()
+            self.draw_move_counter()
+            if self.debug_overlay:
+                self.draw_debug_overlay()
+        screen.set_clip(None)
+        stats["last_frame_ms"] = (time.perf_counter() - start) * 1000
+        stats["frames_drawn"] += 1
+        stats["damaged_area"] += sum(rect.width * rect.height for rect in dirty)
+        return dirty
+
+    def toggle_debug_overlay(self):
+        self.debug_overlay = not self.debug_overlay
+        print("Debug overlay:", "On" if self.debug_overlay else "Off")
+
+    def _debug_lines(self):
+        """Frame and last-solve stats shown by the debug overlay."""
+        if self.is_animating() and clock is not None:
+            rate = f"FPS {clock.get_fps():.0f}"
+        else:
+            rate = "FPS idle"
+        lines = [f"{rate}  frame {self.shown_frame_ms:.1f} ms"]
+        result = self.last_solve
+        if result is None:
+            lines.append("No solve yet")
+        else:
+            length = f"{len(result.moves)} moves" if result.found else "no moves"
+            source = " (cache)" if result.cache_hit else ""
+            lines.append(f"Solve: {result.mode} {result.status}, {length}{source}")
+            lines.append(f"expanded {result.nodes_expanded}  stored {result.states_stored}  "
+                         f"{result.elapsed * 1000:.1f} ms")
+        return tuple(lines)
+
+    def draw_debug_overlay(self):
+        panel = pygame.Surface(DEBUG_OVERLAY_RECT.size, pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 160))
+        for row, line in enumerate(self._debug_lines()):
+            text = self.render_cache.dynamic_text(("debug", row), line, 22, (255, 255, 255))
+            panel.blit(text, (8, 6 + row * 20))
+        screen.blit(panel, DEBUG_OVERLAY_RECT)
 
     def draw(self):
-        screen.blit(background_image, (0, 0))
+        cache = self.render_cache
+        screen.blit(load_image('background.png', (SCREEN_WIDTH, SCREEN_HEIGHT)), (0, 0))
 
-        title_font = pygame.font.Font(None, 50)
-        title_text = title_font.render("Color Sort Game", True, (50, 50, 50))
+        title_text = cache.text("Color Sort Game", 50, (50, 50, 50))
         title_rect = title_text.get_rect(center=(SCREEN_WIDTH // 2, 50))
         screen.blit(title_text, title_rect)
 
+        radius = self.ball_radius
         for i, container in enumerate(self.containers):
-            x = i * (CONTAINER_WIDTH + 20) + 50
-            y = SCREEN_HEIGHT // 2 - CONTAINER_HEIGHT // 2
-
-            if self.selected_container == i:
-                pygame.draw.rect(screen, (211, 211, 211), (x, y, CONTAINER_WIDTH, CONTAINER_HEIGHT))
-            else:
-                pygame.draw.rect(screen, (255, 255, 255), (x, y, CONTAINER_WIDTH, CONTAINER_HEIGHT))
+            x, y = self.container_rect(i).topleft
 
-            pygame.draw.rect(screen, (0, 0, 0), (x, y, CONTAINER_WIDTH, CONTAINER_HEIGHT), 2)
+            screen.blit(cache.container(self.selected_container == i, self.container_width), (x, y))
 
             for j, color in enumerate(container):
-                color_rgb = COLOR_MAP[color]
-                ball_x = x + CONTAINER_WIDTH // 2
-                ball_y = y + CONTAINER_HEIGHT - (j + 1) * ((CONTAINER_HEIGHT - 20) // BALLS_PER_CONTAINER) + BALL_RADIUS
-                pygame.draw.circle(screen, color_rgb, (ball_x, ball_y), BALL_RADIUS)
+                ball_x = x + self.container_width // 2
+                ball_y = y + CONTAINER_HEIGHT - (j + 1) * self.ball_spacing + radius
+                screen.blit(cache.ball(COLOR_MAP[color], radius), (ball_x - radius, ball_y - radius))
 
         hint_button_color_start = (100, 100, 255)
         hint_button_color_end = (50, 50, 255)
-        draw_gradient_circle(self.button_x, self.hint_button_y, BUTTON_RADIUS, hint_button_color_start, hint_button_color_end, clicked=self.hint_button_pressed)
-        font = pygame.font.Font(None, 30)
-        text = font.render("Hint", True, (255, 255, 255))
+        hint_button = cache.button(BUTTON_RADIUS, hint_button_color_start, hint_button_color_end, clicked=self.hint_button_pressed)
+        screen.blit(hint_button, (self.button_x - BUTTON_RADIUS, self.hint_button_y - BUTTON_RADIUS))
+        text = cache.text("Hint", 30, (255, 255, 255))
         screen.blit(text, (self.button_x - 20, self.hint_button_y - 10))
 
         restart_button_color_start = (100, 200, 100)
         restart_button_color_end = (50, 180, 50)
-        draw_gradient_circle(self.button_x, self.restart_button_y, BUTTON_RADIUS, restart_button_color_start, restart_button_color_end, clicked=self.restart_button_pressed)
-        text = font.render("Restart", True, (255, 255, 255))
+        restart_button = cache.button(BUTTON_RADIUS, restart_button_color_start, restart_button_color_end, clicked=self.restart_button_pressed)
+        screen.blit(restart_button, (self.button_x - BUTTON_RADIUS, self.restart_button_y - BUTTON_RADIUS))
+        text = cache.text("Restart", 30, (255, 255, 255))
         text_rect = text.get_rect(center=(self.button_x, self.restart_button_y))
         screen.blit(text, text_rect)
 
         # Draw the Sound toggle button
         sound_button_color_start = (200, 100, 100) if self.sound_on else (150, 150, 150)
         sound_button_color_end = (150, 50, 50) if self.sound_on else (100, 100, 100)
-        draw_gradient_circle(self.sound_button_x, self.sound_button_y, self.sound_button_radius, sound_button_color_start, sound_button_color_end)
+        sound_button = cache.button(self.sound_button_radius, sound_button_color_start, sound_button_color_end)
+        screen.blit(sound_button, (self.sound_button_x - self.sound_button_radius, self.sound_button_y - self.sound_button_radius))
 
-        # Draw text inside the sound button
-        sound_label = self.sound_button_font.render("Sound", True, (255, 255, 255))
-        status_label = self.sound_button_font.render("On" if self.sound_on else "Off", True, (255, 255, 255))
+        # Draw text inside the sound button (smaller font for the button text)
+        sound_label = cache.text("Sound", 20, (255, 255, 255))
+        status_label = cache.text("On" if self.sound_on else "Off", 20, (255, 255, 255))
         screen.blit(sound_label, (self.sound_button_x - sound_label.get_width() // 2, self.sound_button_y - 10))
         screen.blit(status_label, (self.sound_button_x - status_label.get_width() // 2, self.sound_button_y + 5))
 
@@ -251,22 +579,21 @@ class ColorSortGame:
 
         pygame.mixer.music.set_volume(volume)  # Set the background music volume
 
-        font = pygame.font.Font(None, 100)  # Larger font size for emphasis
         colors = [(255, 255, 255), (255, 215, 0)]  # Flash between white and yellow
         current_color = colors[pygame.time.get_ticks() // 500 % 2]  # Toggle color every 500ms for flashing
 
         # Play win sound once when game_won is set to True
         if not self.sound_played:
             if self.sound_on:
-                win_sound.play()
+                load_sound("win.wav").play()
             self.sound_played = True  # Ensure sound only plays once
 
-        win_text = font.render("Good job! You won!", True, current_color)
+        win_text = self.render_cache.text("Good job! You won!", 100, current_color)  # Larger font size for emphasis
         text_rect = win_text.get_rect(center=(SCREEN_WIDTH // 2 - 45, SCREEN_HEIGHT // 2))
 
         background_rect = pygame.Rect(
             50, text_rect.y - 20,
-            (CONTAINER_WIDTH + 20) * NUM_CONTAINERS,
+            self.container_spacing * self.spec.num_containers,
             text_rect.height + 40
         )
         pygame.draw.rect(screen, (0, 0, 0, 200), background_rect)  # Semi-transparent background
@@ -281,8 +608,7 @@ class ColorSortGame:
 
 
     def draw_credit_text(self):
-        font = pygame.font.Font(None, 24)
-        credit_text = font.render("Developed by Eng. Mahmoud Shreef", True, (30, 30, 30))
+        credit_text = self.render_cache.text("Developed by Eng. Mahmoud Shreef", 24, (30, 30, 30))
         credit_rect = credit_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT - 20))
         screen.blit(credit_text, credit_rect)
 
@@ -290,13 +616,13 @@ class ColorSortGame:
         if self.button_x - BUTTON_RADIUS < x < self.button_x + BUTTON_RADIUS:
             if self.hint_button_y - BUTTON_RADIUS < y < self.hint_button_y + BUTTON_RADIUS:
                 if self.sound_on:
-                    click_sound.play()  # Play click sound
+                    load_sound("click.wav").play()  # Play click sound
                 print("Hint button clicked.")
                 self.hint_button_pressed = True
                 self.provide_hint()
             elif self.restart_button_y - BUTTON_RADIUS < y < self.restart_button_y + BUTTON_RADIUS:
                 if self.sound_on:
-                    click_sound.play()  # Play click sound
+                    load_sound("click.wav").play()  # Play click sound
                 print("Restart button clicked.")
                 self.restart_button_pressed = True
                 self.reset_game()
@@ -305,7 +631,7 @@ class ColorSortGame:
                 self.sound_on = not self.sound_on
                 if self.sound_on:
                     pygame.mixer.music.unpause()  # Unpause background music when sound is on
-                    click_sound.play()  # Play click sound if sound is turned on
+                    load_sound("click.wav").play()  # Play click sound if sound is turned on
                 else:
                     pygame.mixer.music.pause()  # Pause the background music when sound is off
                     pygame.mixer.stop()  # Stop all sound effects when sound is off
@@ -313,7 +639,7 @@ class ColorSortGame:
 
     def handle_hidden_button_click(self):
         if self.sound_on:
-            hidden_click_sound.play()  # Play hidden button click sound
+            load_sound("hidden_click.wav").play()  # Play hidden button click sound
         open_solution_window(self.solution)
 
     def handle_button_release(self):
@@ -321,17 +647,19 @@ class ColorSortGame:
         self.restart_button_pressed = False
 
     def select_container(self, index):
+        if self.dealing:
+            return
         print(f"Container {index + 1} selected.")
         if self.selected_container is None:
             if self.containers[index]:
                 self.selected_container = index
         else:
             if self.move_ball(self.selected_container, index):
-                self.move_count += 1  # Increment move counter
                 if self.sound_on:
-                    move_sound.play()  # Play move sound
+                    load_sound("move.wav").play()  # Play move sound
                 print(f"Moved ball from container {self.selected_container + 1} to container {index + 1}.")
                 self.selected_container = None
+                self._board_changed()
                 if self.is_solved([list(container) for container in self.containers]):
                     print("Game won!")
                     self.game_won = True
@@ -339,38 +667,33 @@ class ColorSortGame:
                 self.selected_container = None
 
     def move_ball(self, from_idx, to_idx):
-        if from_idx == to_idx or not self.containers[from_idx]:
-            return False
-
-        if len(self.containers[to_idx]) >= BALLS_PER_CONTAINER:
-            return False
-
-        if not self.containers[to_idx] or self.containers[from_idx][-1] == self.containers[to_idx][-1]:
+        if super().move_ball(from_idx, to_idx):
             # Perform the move directly, no animation
-            self.containers[to_idx].append(self.containers[from_idx].pop())
             self.move_count += 1  # Increment move counter
+            if self.replay_writer is not None:
+                self.replay_writer.append(from_idx, to_idx)
 
             if self.sound_on:
-                move_sound.play()  # Play move sound
+                load_sound("move.wav").play()  # Play move sound
 
             return True
         return False
 
-    def is_solved(self, containers):
-        for container in containers:
-            if len(container) > 0:
-                if len(container) != BALLS_PER_CONTAINER or len(set(container)) > 1:
-                    return False
-        return True
-
     def provide_hint(self):
-        self.solution = []
-        self.hint_counter = 0
-        self.is_solution_ready = False
+        if self.dealing:
+            return
+        index = self.solution_states.get(self._current_state())
+        if index is not None:
+            # Still on the cached solution path: hand out the next move without searching
+            self.hint_counter = index
+            self.show_next_hint()
+            return
+        self.hint_requested = True
+        self.hint_text = "Thinking..."
         print("Calculating hint...")
-        hint_thread = threading.Thread(target=self.find_solution_from_current_state)
-        hint_thread.start()
-        hint_thread.join()
+        self._request_solution()
+
+    def show_next_hint(self):
         if self.is_solution_ready and self.solution:
             if self.hint_counter < len(self.solution):
                 move = self.solution[self.hint_counter]
@@ -383,90 +706,156 @@ class ColorSortGame:
             self.hint_text = "No solution found."
             print(self.hint_text)
 
-    def find_solution_from_current_state(self):
-        initial_state = tuple(tuple(container) for container in self.containers)
-        queue = deque([(initial_state, [])])
-        visited = set()
-        visited.add(initial_state)
-
-        while queue:
-            state, path = queue.popleft()
-            if self.is_solved(state):
-                self.solution = path
-                self.is_solution_ready = True
-                print("Solution found.")
-                return
-            for i in range(NUM_CONTAINERS):
-                for j in range(NUM_CONTAINERS):
-                    if i != j:
-                        new_state = self.make_move(state, i, j)
-                        if new_state and new_state not in visited:
-                            visited.add(new_state)
-                            queue.append((new_state, path + [(i, j)]))
-        self.solution = []
-        self.is_solution_ready = False
-        print("No solution found.")
-
-    def make_move(self, state, from_idx, to_idx):
-        state_copy = [deque(container) for container in state]
-        if state_copy[from_idx] and (len(state_copy[to_idx]) < BALLS_PER_CONTAINER):
-            if not state_copy[to_idx] or state_copy[from_idx][-1] == state_copy[to_idx][-1]:
-                state_copy[to_idx].append(state_copy[from_idx].pop())
-                return tuple(tuple(container) for container in state_copy)
-        return None
+    def _board_changed(self):
+        """Start a new board generation, abandoning searches for the old board."""
+        self.board_generation += 1
+        self.hint_worker.set_generation(self.board_generation)
+        self.solving_generation = None
+        if self.hint_requested:
+            self.hint_requested = False
+            self.hint_text = ""
+
+    def _request_solution(self):
+        # One search per board is enough; a second Hint click just waits for it
+        if self.solving_generation != self.board_generation:
+            self.solving_generation = self.board_generation
+            # The cached path warm-starts the search: rejoining it ends the search early
+            known_paths = [(self.solution_start, self.solution)] if self.solution else None
+            self.hint_worker.submit(self.board_generation, self._current_state(), known_paths)
+
+    def _post_solver_done(self):
+        # Runs on the worker thread; posting to pygame's event queue is thread-safe
+        pygame.event.post(pygame.event.Event(SOLVER_DONE_EVENT))
+
+    def update(self):
+        """Pick up a finished background search; called once per frame."""
+        finished = self.hint_worker.poll()
+        if finished is None:
+            return
+        _, state, result, rejected = finished
+        if rejected is not None:
+            self._board_dealt(state, result, rejected)
+            return
+        self.solving_generation = None
+        self._apply_solve_result(result, state)
+        if self.hint_requested:
+            self.hint_requested = False
+            self.show_next_hint()
+
+    def _apply_solve_result(self, result, state):
+        super()._apply_solve_result(result, state)
+        print("Solution cache:", self.solution_cache.stats())
 
     def draw_hint(self):
-        font = pygame.font.Font(None, 36)
-        feeling_text = font.render("Feeling stuck? ): Click Hint to get the next move.", True, (0, 0, 0))
+        feeling_text = self.render_cache.text("Feeling stuck? ): Click Hint to get the next move.", 36, (0, 0, 0))
         screen.blit(feeling_text, (10, SCREEN_HEIGHT - 120))
         if self.hint_text:
-            hint_text = font.render(self.hint_text, True, (0, 0, 0))
+            hint_text = self.render_cache.dynamic_text("hint", self.hint_text, 36, (0, 0, 0))
             screen.blit(hint_text, (10, SCREEN_HEIGHT - 80))
             
     def draw_move_counter(self):
-        font = pygame.font.Font(None, 36)
-        
         # Render the "Moves" label
-        moves_label = font.render("Moves:", True, (0, 0, 0))
+        moves_label = self.render_cache.text("Moves:", 36, (0, 0, 0))
         label_x = self.button_x - 30  # Align with the restart button's x-coordinate
         label_y = self.restart_button_y + BUTTON_RADIUS + 20  # Position below the restart button
         screen.blit(moves_label, (label_x, label_y))
         
         # Render the move count number and center it under the "Moves" label
-        move_text = font.render(f"{self.move_count}", True, (0, 0, 0))
+        move_text = self.render_cache.dynamic_text("moves", f"{self.move_count}", 36, (0, 0, 0))
         move_text_x = label_x + (moves_label.get_width() - move_text.get_width()) // 2  # Center the number
         move_text_y = label_y + 30  # Position the number directly below the "Moves" label
         screen.blit(move_text, (move_text_x, move_text_y))
 
-game = ColorSortGame()
-running = True
-
-while running:
-    screen.blit(background_image, (0, 0))
-    game.draw()
-    game.draw_move_counter()  # Display the move counter
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            print("Game closed.")
-            running = False
-        elif event.type == pygame.MOUSEBUTTONDOWN:
-            x, y = event.pos
-            game.handle_button_click(x, y)
-            
-            # Check for hidden button area
-            if 10 < x < 50 and 10 < y < 50:
-                if game.solution:
-                    game.handle_hidden_button_click()
-                    
-            for i in range(NUM_CONTAINERS):
-                container_x = i * (CONTAINER_WIDTH + 20) + 50
-                container_y = SCREEN_HEIGHT // 2 - CONTAINER_HEIGHT // 2
-                if container_x < x < container_x + CONTAINER_WIDTH and container_y < y < container_y + CONTAINER_HEIGHT:
-                    game.select_container(i)
-                    break
-        elif event.type == pygame.MOUSEBUTTONUP:
-            game.handle_button_release()
-    pygame.display.flip()
-    clock.tick(60)
-
-pygame.quit()
+def main():
+    global screen, clock
+
+    parser = argparse.ArgumentParser(description="Play Color Sort.")
+    add_spec_arguments(parser)
+    parser.add_argument("--seed", type=int, default=None, help="seed for the board generator")
+    parser.add_argument("--debug", action="store_true", help="start with the debug overlay on (F3 toggles it)")
+    parser.add_argument("--solver-metrics", metavar="PATH", help="append the metrics of every solve to PATH as JSON lines")
+    parser.add_argument("--profile-solver", action="store_true", help="profile every solve with cProfile")
+    parser.add_argument("--record", metavar="DIR", help="write a replay log of every board to DIR")
+    parser.add_argument("--replay", metavar="PATH", help="start from the position in a replay log (sets the size)")
+    parser.add_argument("--replay-move", type=int, default=None, metavar="N",
+                        help="start after N moves of the replay instead of at its end")
+    args = parser.parse_args()
+    spec = spec_from_args(parser, args)
+    if args.replay:
+        try:
+            replay_length = len(Replay(args.replay))
+        except (OSError, ValueError) as error:
+            parser.error(f"can't load --replay: {error}")
+        if args.replay_move is not None and not 0 <= args.replay_move <= replay_length:
+            parser.error(f"--replay-move must be between 0 and {replay_length}, got {args.replay_move}")
+    elif args.replay_move is not None:
+        parser.error("--replay-move needs --replay")
+
+    # Initialize Pygame
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    pygame.display.set_caption("Color Sort Game!")
+    pygame.event.set_blocked(pygame.MOUSEMOTION)  # Nothing follows the pointer; don't wake the idle loop for it
+    clock = pygame.time.Clock()
+
+    # Initialize Pygame mixer for sound effects
+    pygame.mixer.init()
+    pygame.mixer.music.load("background_music.mp3")
+    pygame.mixer.music.play(-1, 0.0)  # Play background music indefinitely
+
+    # Adjust the volume of the background music (set it to 30% of the max volume)
+    pygame.mixer.music.set_volume(0.25)
+
+    rng = random.Random(args.seed) if args.seed is not None else random
+    if args.replay:
+        game = ColorSortGame.from_replay(args.replay, args.replay_move, rng)
+        spec = game.spec
+    else:
+        game = ColorSortGame(spec, rng)
+    if args.record:
+        game.start_recording(args.record, args.seed)
+    game.debug_overlay = args.debug
+    game.solver.metrics_log = args.solver_metrics
+    game.solver.profile = args.profile_solver
+    running = True
+
+    while running:
+        game.update()  # Collect background solver results without blocking the frame
+        dirty = game.render()  # Redraws only what changed since the last frame
+        if dirty:
+            pygame.display.update(dirty)
+
+        if game.is_animating():
+            events = pygame.event.get()
+            clock.tick(60)
+        else:
+            # Nothing moves on its own, so sleep until input or a finished hint search
+            events = [pygame.event.wait()] + pygame.event.get()
+
+        for event in events:
+            if event.type == pygame.QUIT:
+                print("Game closed.")
+                running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN:
+                x, y = event.pos
+                game.handle_button_click(x, y)
+
+                # Check for hidden button area
+                if 10 < x < 50 and 10 < y < 50:
+                    if game.solution:
+                        game.handle_hidden_button_click()
+
+                for i in range(spec.num_containers):
+                    if game.container_rect(i).collidepoint(x, y):
+                        game.select_container(i)
+                        break
+            elif event.type == pygame.MOUSEBUTTONUP:
+                game.handle_button_release()
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                game.toggle_debug_overlay()
+
+    print("Render stats:", game.render_stats)
+    pygame.quit()
+
+if __name__ == "__main__":
+    main()
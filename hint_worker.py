@@ -0,0 +1,91 @@
+"""Background solver worker for the game's hints.
+
+The game never waits on a search.  Every solve request is tagged with the
+board generation it was made for; the game bumps the generation whenever
+the board changes (restart or player move), which cancels any job still
+working on an older board.  Finished results are collected with poll() once
+per frame.  New boards are dealt on the same thread (deal()), because the
+solvability check of a large shuffle takes too long for a frame.  A search
+that raises is reported as a "failed" result, so the worker keeps serving
+later requests.  An optional `on_result` callback runs on the worker thread
+whenever a result is ready, so an idle main loop can be woken up.
+"""
+import queue
+import threading
+
+from color_sort_core import generate_solvable_containers
+from solver import SolveResult
+
+
+class HintWorker:
+    def __init__(self, solver, colors=None, on_result=None):
+        self.solver = solver
+        self.colors = colors
+        self.on_result = on_result
+        self.generation = 0
+        self._jobs = queue.Queue()
+        self._results = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="hint-worker", daemon=True)
+        self._thread.start()
+
+    def set_generation(self, generation):
+        """Mark the board as changed; jobs for earlier generations are abandoned."""
+        self.generation = generation
+
+    def submit(self, generation, state, known_paths=None):
+        """Queue a solve of `state` for the given board generation."""
+        self._jobs.put((generation, "solve", (state, known_paths)))
+
+    def deal(self, generation, spec, rng):
+        """Queue shuffling a solvable board for `spec`; its result carries the shuffle count.
+
+        The solvability check runs in the solver's mode, so a solution it
+        finds is handed back as the board's SolveResult.
+        """
+        self._jobs.put((generation, "deal", (spec, rng)))
+
+    def poll(self):
+        """Return the newest (generation, state, SolveResult, rejected) for the current board, or None.
+
+        `rejected` is the number of unsolvable shuffles thrown away for a
+        dealt board and None for a search.  A dealt board whose check didn't
+        solve it comes with result None.
+        """
+        latest = None
+        while True:
+            try:
+                finished = self._results.get_nowait()
+            except queue.Empty:
+                return latest
+            if finished[0] == self.generation:
+                latest = finished
+
+    def _run(self):
+        while True:
+            generation, kind, payload = self._jobs.get()
+            if generation != self.generation:
+                continue  # The board changed before the job started
+            if kind == "deal":
+                spec, rng = payload
+                try:
+                    containers, rejected, check = generate_solvable_containers(spec, rng, mode=self.solver.mode)
+                    state = tuple(tuple(container) for container in containers)
+                    result = check if check is not None and check.found else None
+                except Exception as error:
+                    print(f"Dealing a board failed: {error!r}")
+                    state, result, rejected = None, SolveResult(self.solver.mode, "failed"), 0
+                self._results.put((generation, state, result, rejected))
+                if self.on_result is not None:
+                    self.on_result()
+                continue
+            state, known_paths = payload
+            try:
+                result = self.solver.solve(state, colors=self.colors, known_paths=known_paths,
+                                           cancel=lambda: generation != self.generation)
+            except Exception as error:
+                print(f"Hint search failed: {error!r}")
+                result = SolveResult(self.solver.mode, "failed")
+            if result.status != "cancelled":
+                self._results.put((generation, state, result, None))
+                if self.on_result is not None:
+                    self.on_result()
@@ -0,0 +1,278 @@
+"""Compact integer encoding of puzzle states.
+
+A whole board is packed into one int.  Each container owns a fixed-width
+field: the low bits hold its height and the remaining bits hold one color
+code per slot, bottom slot first.  Color codes start at 1 so an empty slot
+reads as 0.  Legal-move checks and successor generation work directly on
+the packed value with shifts and adds, so the search never builds
+intermediate lists or tuples.
+"""
+
+
+class StateCodec:
+    """Packs and unpacks boards with a fixed number of containers, capacity and palette."""
+
+    def __init__(self, num_containers, capacity, colors):
+        self.num_containers = num_containers
+        self.capacity = capacity
+        self.colors = tuple(colors)
+        self.color_codes = {color: code for code, color in enumerate(self.colors, start=1)}
+
+        self.color_bits = max(1, len(self.colors).bit_length())
+        self.height_bits = capacity.bit_length()
+        self.tube_bits = self.height_bits + capacity * self.color_bits
+        self.tube_mask = (1 << self.tube_bits) - 1
+        self.height_mask = (1 << self.height_bits) - 1
+        self.color_mask = (1 << self.color_bits) - 1
+        self.offsets = tuple(i * self.tube_bits for i in range(num_containers))
+
+        # delta[i][h][c]: value to add to place color c into slot h of container i
+        # (and bump its height).  Subtracting the entry for the top slot removes it.
+        self._delta = tuple(
+            tuple(
+                tuple((1 << offset) + (code << (offset + self.height_bits + slot * self.color_bits))
+                      for code in range(len(self.colors) + 1))
+                for slot in range(capacity)
+            )
+            for offset in self.offsets
+        )
+        # Fields of containers that are full with a single color
+        self._full_tubes = frozenset(self.pack_tube([code] * capacity)
+                                     for code in range(1, len(self.colors) + 1))
+        self._tube_info = {}
+        self._top_info = {}  # field -> (height, top color, holds a single color), for pruned_successors
+        self.pruned = 0  # Moves skipped by pruned_successors()
+
+    @classmethod
+    def for_state(cls, state, capacity, colors=None):
+        """Build a codec for a tuple-of-tuples state, taking the palette from its balls."""
+        if colors is None:
+            colors = sorted({ball for container in state for ball in container})
+        return cls(len(state), capacity, colors)
+
+    def pack_tube(self, codes):
+        field = len(codes)
+        for slot, code in enumerate(codes):
+            field |= code << (self.height_bits + slot * self.color_bits)
+        return field
+
+    def unpack_tube(self, field):
+        height = field & self.height_mask
+        return tuple((field >> (self.height_bits + slot * self.color_bits)) & self.color_mask
+                     for slot in range(height))
+
+    def encode(self, state):
+        code = 0
+        for offset, container in zip(self.offsets, state):
+            code |= self.pack_tube([self.color_codes[ball] for ball in container]) << offset
+        return code
+
+    def decode(self, code):
+        colors = self.colors
+        return tuple(tuple(colors[c - 1] for c in self.unpack_tube(field))
+                     for field in self.tubes(code))
+
+    def tubes(self, code):
+        """Container fields of a packed state, in container order."""
+        mask = self.tube_mask
+        return [(code >> offset) & mask for offset in self.offsets]
+
+    def canonical(self, code):
+        """Key shared by every tube permutation of a state: the container fields sorted."""
+        mask = self.tube_mask
+        fields = sorted([(code >> offset) & mask for offset in self.offsets])
+        key = 0
+        for offset, field in zip(self.offsets, fields):
+            key |= field << offset
+        return key
+
+    def tube_permutation(self, src, dst):
+        """Map container indices of `src` onto those of `dst`, a tube permutation of it.
+
+        perm[k] is the index in `dst` holding the same contents as container k
+        of `src`, so a move (i, j) on `src` is the move (perm[i], perm[j]) on `dst`.
+        """
+        positions = {}
+        for index, field in enumerate(self.tubes(dst)):
+            positions.setdefault(field, []).append(index)
+        return [positions[field].pop() for field in self.tubes(src)]
+
+    def successors(self, code):
+        """Yield (from_idx, to_idx, new_code) for every legal move."""
+        capacity = self.capacity
+        height_mask = self.height_mask
+        color_mask = self.color_mask
+        height_bits = self.height_bits
+        color_bits = self.color_bits
+        delta = self._delta
+        mask = self.tube_mask
+
+        heights = []
+        tops = []
+        for offset in self.offsets:
+            field = (code >> offset) & mask
+            height = field & height_mask
+            heights.append(height)
+            tops.append((field >> (height_bits + (height - 1) * color_bits)) & color_mask if height else 0)
+
+        num_containers = self.num_containers
+        for i in range(num_containers):
+            height = heights[i]
+            if not height:
+                continue
+            color = tops[i]
+            base = code - delta[i][height - 1][color]
+            for j in range(num_containers):
+                if j == i:
+                    continue
+                target_height = heights[j]
+                if target_height == capacity or (target_height and tops[j] != color):
+                    continue
+                yield i, j, base + delta[j][target_height][color]
+
+    def pruned_successors(self, code):
+        """successors() without the moves that never shorten a solution.
+
+        Nothing leaves a complete container (full, one color), a container
+        holding a single color is never split into an empty one, and only the
+        first empty container is a target since the others give the same board
+        up to container order.  Moves onto a matching ball come before moves
+        into an empty container.  Skipped moves are counted in self.pruned.
+        """
+        capacity = self.capacity
+        delta = self._delta
+        top_info = self._top_info
+        mask = self.tube_mask
+
+        heights = []
+        tops = []
+        uniform = []
+        for offset in self.offsets:
+            field = (code >> offset) & mask
+            info = top_info.get(field)
+            if info is None:
+                _, run, height = self.tube_info(field)
+                codes = self.unpack_tube(field)
+                info = top_info[field] = (height, codes[-1] if codes else 0, run == height)
+            heights.append(info[0])
+            tops.append(info[1])
+            uniform.append(info[2])
+        empty = heights.index(0) if 0 in heights else None
+        empties = heights.count(0)
+
+        num_containers = self.num_containers
+        into_empty = []
+        for i in range(num_containers):
+            height = heights[i]
+            if not height:
+                continue
+            color = tops[i]
+            if uniform[i]:
+                if height == capacity:
+                    self.pruned += empties + sum(1 for j in range(num_containers) if j != i and tops[j] == color
+                                                 and heights[j] < capacity)
+                    continue
+                self.pruned += empties
+            elif empty is not None:
+                self.pruned += empties - 1
+            base = code - delta[i][height - 1][color]
+            for j in range(num_containers):
+                target_height = heights[j]
+                if j == i or not target_height or target_height == capacity or tops[j] != color:
+                    continue
+                yield i, j, base + delta[j][target_height][color]
+            if empty is not None and not uniform[i]:
+                into_empty.append((i, empty, base + delta[empty][0][color]))
+        yield from into_empty
+
+    def predecessors(self, code):
+        """Yield (from_idx, to_idx, previous_code) for every state one legal move before `code`.
+
+        The move is the forward move, so applying it to previous_code gives `code`.
+        """
+        capacity = self.capacity
+        height_mask = self.height_mask
+        color_mask = self.color_mask
+        height_bits = self.height_bits
+        color_bits = self.color_bits
+        delta = self._delta
+        mask = self.tube_mask
+
+        heights = []
+        tops = []
+        seconds = []  # Color just below the top, 0 if there is none
+        for offset in self.offsets:
+            field = (code >> offset) & mask
+            height = field & height_mask
+            heights.append(height)
+            tops.append((field >> (height_bits + (height - 1) * color_bits)) & color_mask if height else 0)
+            seconds.append((field >> (height_bits + (height - 2) * color_bits)) & color_mask if height > 1 else 0)
+
+        num_containers = self.num_containers
+        for j in range(num_containers):
+            height = heights[j]
+            if not height:
+                continue
+            color = tops[j]
+            # The ball can only have landed on j if j was empty or topped with the same color
+            if height > 1 and seconds[j] != color:
+                continue
+            base = code - delta[j][height - 1][color]
+            for i in range(num_containers):
+                if i == j or heights[i] == capacity:
+                    continue
+                yield i, j, base + delta[i][heights[i]][color]
+
+    def solved_state(self, code):
+        """A solved state holding the same balls as `code`, or None if they can't all be sorted."""
+        counts = {}
+        for field in self.tubes(code):
+            for color in self.unpack_tube(field):
+                counts[color] = counts.get(color, 0) + 1
+        fields = []
+        for color, count in sorted(counts.items()):
+            full, rest = divmod(count, self.capacity)
+            if rest:
+                return None
+            fields.extend([self.pack_tube([color] * self.capacity)] * full)
+        if len(fields) > self.num_containers:
+            return None
+        goal = 0
+        for offset, field in zip(self.offsets, fields):
+            goal |= field << offset
+        return goal
+
+    def apply_move(self, code, from_idx, to_idx):
+        """Packed counterpart of solver.apply_move; returns None for illegal moves."""
+        source = (code >> self.offsets[from_idx]) & self.tube_mask
+        target = (code >> self.offsets[to_idx]) & self.tube_mask
+        source_height = source & self.height_mask
+        target_height = target & self.height_mask
+        if from_idx == to_idx or not source_height or target_height >= self.capacity:
+            return None
+        color = (source >> (self.height_bits + (source_height - 1) * self.color_bits)) & self.color_mask
+        if target_height:
+            target_top = (target >> (self.height_bits + (target_height - 1) * self.color_bits)) & self.color_mask
+            if target_top != color:
+                return None
+        return (code - self._delta[from_idx][source_height - 1][color]
+                + self._delta[to_idx][target_height][color])
+
+    def is_solved(self, code):
+        full_tubes = self._full_tubes
+        for field in self.tubes(code):
+            if field and field not in full_tubes:
+                return False
+        return True
+
+    def tube_info(self, field):
+        """(bottom color, bottom run length, height) of a container field, memoized."""
+        info = self._tube_info.get(field)
+        if info is None:
+            codes = self.unpack_tube(field)
+            run = 0
+            while run < len(codes) and codes[run] == codes[0]:
+                run += 1
+            info = (codes[0] if codes else 0, run, len(codes))
+            self._tube_info[field] = info
+        return info
@@ -0,0 +1,261 @@
+"""Append-only binary log of one game: the board it started from and every move.
+
+Layout (little-endian):
+
+    header   b"CSRL", version, colors, empty containers, capacity, move width,
+             snapshot interval (2 bytes), board number (4 bytes),
+             seed (1-byte length + UTF-8), palette (2-byte length + names
+             joined by ","), initial board (packed, see below)
+    blocks   `interval` moves, then 0xFF and a snapshot of the board after them
+
+A move is one byte, from_idx * (n - 1) + to_idx (skipping from_idx), for up
+to 16 containers, and two bytes (from_idx, to_idx) above that.  Boards are
+StateCodec integers stored in a fixed number of bytes, so every block has
+the same size and the board after any move is one seek plus at most
+`interval` moves away.  A log cut short by a crash loses at most the last,
+partly written record.
+
+Check logs against the game rules, or print a position (optionally solving it):
+
+    python replay_log.py verify replays/*.csreplay
+    python replay_log.py show replays/game.csreplay --move 12 --solve
+"""
+import argparse
+import os
+import struct
+import time
+from collections import deque
+from multiprocessing import Pool, cpu_count
+
+from color_sort_core import ColorSortBoard, PuzzleSpec
+from packed_state import StateCodec
+from solver import Solver
+
+MAGIC = b"CSRL"
+VERSION = 1
+SNAPSHOT_INTERVAL = 64  # Moves between snapshots
+SNAPSHOT_MARKER = 0xFF
+_HEADER = struct.Struct("<4sBBBBBHI")
+
+
+def _codec(spec):
+    return StateCodec(spec.num_containers, spec.capacity, spec.colors)
+
+
+def _state_size(codec):
+    return (codec.num_containers * codec.tube_bits + 7) // 8
+
+
+class ReplayWriter:
+    """Creates a log for a board and appends moves to it as they are played."""
+
+    def __init__(self, path, spec, containers, seed=None, board_number=0, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self.spec = spec
+        self.codec = _codec(spec)
+        self.state_size = _state_size(self.codec)
+        self.snapshot_interval = snapshot_interval
+        self.move_width = 1 if spec.num_containers * (spec.num_containers - 1) < SNAPSHOT_MARKER else 2
+        self.state = self.codec.encode(tuple(tuple(container) for container in containers))
+        self.moves = 0
+        seed_bytes = b"" if seed is None else str(seed).encode()
+        palette = ",".join(spec.colors).encode()
+        header = _HEADER.pack(MAGIC, VERSION, spec.num_colors, spec.empty_containers, spec.capacity,
+                              self.move_width, snapshot_interval, board_number)
+        header += bytes([len(seed_bytes)]) + seed_bytes + struct.pack("<H", len(palette)) + palette
+        header += self.state.to_bytes(self.state_size, "little")
+        self._file = open(path, "wb")
+        self._file.write(header)
+        self._file.flush()
+
+    def append(self, from_idx, to_idx):
+        """Log a move; raises ValueError if it isn't legal on the logged board."""
+        state = self.codec.apply_move(self.state, from_idx, to_idx)
+        if state is None:
+            raise ValueError(f"Illegal move {from_idx} -> {to_idx} after {self.moves} moves")
+        self.state = state
+        self.moves += 1
+        record = _encode_move(from_idx, to_idx, self.spec.num_containers, self.move_width)
+        if self.moves % self.snapshot_interval == 0:
+            record += bytes([SNAPSHOT_MARKER]) + state.to_bytes(self.state_size, "little")
+        self._file.write(record)
+        self._file.flush()  # Every logged move survives a crash
+
+    def close(self):
+        self._file.close()
+
+
+class Replay:
+    """Read side of a log; positions are restored from the nearest snapshot."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as log:
+            fixed = log.read(_HEADER.size)
+            if len(fixed) < _HEADER.size:
+                raise ValueError(f"{path}: too short to be a replay log")
+            (magic, version, num_colors, empty_containers, capacity, self.move_width,
+             self.snapshot_interval, self.board_number) = _HEADER.unpack(fixed)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path}: not a version {VERSION} replay log")
+            try:
+                seed = log.read(log.read(1)[0]).decode()
+                (palette_size,) = struct.unpack("<H", log.read(2))
+                colors = log.read(palette_size).decode().split(",")
+            except (IndexError, struct.error, UnicodeDecodeError):
+                raise ValueError(f"{path}: replay log header is damaged")
+            self.seed = seed or None
+            self.spec = PuzzleSpec(num_colors, empty_containers, capacity, palette=colors)
+            self.codec = _codec(self.spec)
+            self.state_size = _state_size(self.codec)
+            self.initial = int.from_bytes(log.read(self.state_size), "little")
+            self.header_size = log.tell()
+        self.block_size = self.snapshot_interval * self.move_width + 1 + self.state_size
+        body = os.path.getsize(path) - self.header_size
+        full_blocks, rest = divmod(body, self.block_size)
+        # A block's last move is written together with its snapshot, so it only counts once that is complete
+        self.move_count = full_blocks * self.snapshot_interval + min(rest // self.move_width,
+                                                                     self.snapshot_interval - 1)
+
+    def __len__(self):
+        return self.move_count
+
+    def moves(self):
+        """Every logged move as (from_idx, to_idx)."""
+        with open(self.path, "rb") as log:
+            log.seek(self.header_size)
+            return list(_decode_moves(log.read(), self))[:self.move_count]
+
+    def packed_state_at(self, index):
+        """Packed board after the first `index` moves."""
+        if not 0 <= index <= self.move_count:
+            raise IndexError(f"Move {index} is outside the log (0..{self.move_count})")
+        block, offset = divmod(index, self.snapshot_interval)
+        with open(self.path, "rb") as log:
+            state = self.initial
+            if block:
+                log.seek(self.header_size + block * self.block_size - self.state_size)
+                state = int.from_bytes(log.read(self.state_size), "little")
+            log.seek(self.header_size + block * self.block_size)
+            data = log.read(offset * self.move_width)
+        for from_idx, to_idx in _decode_block(data, self.spec.num_containers, self.move_width):
+            state = self.codec.apply_move(state, from_idx, to_idx)
+        return state
+
+    def state_at(self, index):
+        """Board after the first `index` moves, as a tuple-of-tuples state."""
+        return self.codec.decode(self.packed_state_at(index))
+
+
+def _encode_move(from_idx, to_idx, num_containers, move_width):
+    if move_width == 2:
+        return bytes([from_idx, to_idx])
+    return bytes([from_idx * (num_containers - 1) + to_idx - (to_idx > from_idx)])
+
+
+def _decode_block(data, num_containers, move_width):
+    if move_width == 2:
+        for k in range(0, len(data) - 1, 2):
+            yield data[k], data[k + 1]
+        return
+    for code in data:
+        from_idx, to_idx = divmod(code, num_containers - 1)
+        yield from_idx, to_idx + (to_idx >= from_idx)
+
+
+def _decode_moves(body, replay):
+    """Moves of a log body, skipping the snapshots between blocks."""
+    moves_size = replay.snapshot_interval * replay.move_width
+    for start in range(0, len(body), replay.block_size):
+        yield from _decode_block(body[start:start + moves_size], replay.spec.num_containers, replay.move_width)
+
+
+def verify(path):
+    """Replay a log through ColorSortBoard.move_ball and check every snapshot.
+
+    Returns a dict with the move count, whether the board ends solved, and
+    the first problem found (None when the log is valid).  A log cut short
+    inside a record is reported too, with the moves before it counted.
+    """
+    report = {"path": path, "moves": 0, "solved": False, "error": None}
+    try:
+        replay = Replay(path)
+        with open(path, "rb") as log:
+            log.seek(replay.header_size)
+            body = log.read()
+    except (OSError, ValueError) as error:
+        report["error"] = str(error)
+        return report
+    board = ColorSortBoard(Solver(capacity=replay.spec.capacity), spec=replay.spec)
+    board.containers = [deque(container) for container in replay.codec.decode(replay.initial)]
+    moves_size = replay.snapshot_interval * replay.move_width
+    for start in range(0, len(body), replay.block_size):
+        moves = list(_decode_block(body[start:start + moves_size], replay.spec.num_containers, replay.move_width))
+        snapshot = body[start + moves_size:start + replay.block_size]
+        complete = len(snapshot) == 1 + replay.state_size
+        if len(moves) == replay.snapshot_interval and not complete:
+            moves.pop()  # Its snapshot never made it to disk
+        for from_idx, to_idx in moves:
+            if not (from_idx < len(board.containers) and to_idx < len(board.containers)
+                    and board.move_ball(from_idx, to_idx)):
+                report["error"] = f"illegal move {from_idx + 1} -> {to_idx + 1} at move {report['moves'] + 1}"
+                return report
+            report["moves"] += 1
+        if not complete:
+            # Only a tail of whole moves may follow the last snapshot
+            if len(body) - start != len(moves) * replay.move_width:
+                report["error"] = f"log cut short inside the record after move {report['moves']}"
+                return report
+            break
+        if snapshot[0] != SNAPSHOT_MARKER:
+            report["error"] = f"missing snapshot marker after move {report['moves']}"
+            return report
+        logged = int.from_bytes(snapshot[1:], "little")
+        if logged != replay.codec.encode(board._current_state()):
+            report["error"] = f"snapshot after move {report['moves']} doesn't match the replayed board"
+            return report
+    report["solved"] = board.is_solved(board.containers)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check or inspect Color Sort replay logs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    check = commands.add_parser("verify", help="replay logs against the game rules")
+    check.add_argument("paths", nargs="+")
+    check.add_argument("--workers", type=int, default=cpu_count())
+    show = commands.add_parser("show", help="print the board at a move")
+    show.add_argument("path")
+    show.add_argument("--move", type=int, default=None, help="number of moves played (default: all)")
+    show.add_argument("--solve", action="store_true", help="solve the position and print the solver metrics")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        replay = Replay(args.path)
+        index = len(replay) if args.move is None else args.move
+        state = replay.state_at(index)
+        print(f"{args.path}: {replay.spec}, seed {replay.seed}, board {replay.board_number}, "
+              f"move {index} of {len(replay)}")
+        for number, container in enumerate(state, start=1):
+            print(f"Container {number}: {', '.join(container) or '(empty)'}")
+        if args.solve:
+            result = Solver(capacity=replay.spec.capacity).solve(state, colors=replay.spec.colors)
+            print(result.as_dict())
+        return
+
+    start = time.perf_counter()
+    with Pool(min(args.workers, len(args.paths))) as pool:
+        reports = pool.map(verify, args.paths, chunksize=max(1, len(args.paths) // (4 * args.workers)))
+    elapsed = time.perf_counter() - start
+    failed = [report for report in reports if report["error"]]
+    for report in failed:
+        print(f"{report['path']}: {report['error']}")
+    moves = sum(report["moves"] for report in reports)
+    print(f"{len(reports) - len(failed)}/{len(reports)} logs valid, {moves} moves "
+          f"in {elapsed:.2f}s ({moves / elapsed:.0f} moves/s)")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""On-disk cache of solved positions.
+
+Entries live in a small SQLite file keyed by the canonical board encoding
+(see StateCodec.canonical), so every tube permutation of a board shares one
+entry.  The stored move list is optimal and expressed in the canonical
+container order; the solver translates it back to the real order.  The
+cache is size-bounded and evicts the least recently used entries first.
+Reads only note the time; the last-used column is written in one batch by
+flush() (once per solve) or the next put_many(), so a lookup inside the
+search costs no disk write.
+"""
+import sqlite3
+import threading
+import time
+
+
+class SolutionCache:
+    def __init__(self, path="solution_cache.sqlite3", max_entries=200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.intermediate_hits = 0  # Distinct cached states that searches reached away from the start
+        self._touched = {}  # key -> time of its latest read, not yet written to last_used
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS solutions ("
+            " key TEXT PRIMARY KEY,"
+            " moves BLOB NOT NULL,"
+            " distance INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS solutions_lru ON solutions (last_used)")
+        self._conn.commit()
+        # Keys held in memory so the search can probe intermediate states cheaply
+        self._keys = {}
+        for (key,) in self._conn.execute("SELECT key FROM solutions"):
+            prefix, _, code = key.rpartition(":")
+            self._keys.setdefault(prefix, set()).add(int(code, 16))
+
+    @staticmethod
+    def prefix(codec):
+        """Board dimensions and palette; part of every key so different setups never collide."""
+        return f"{codec.num_containers}x{codec.capacity}:{'/'.join(codec.colors)}"
+
+    def keys(self, prefix):
+        """Canonical codes cached for one board setup (a live set, do not modify)."""
+        return self._keys.setdefault(prefix, set())
+
+    def get(self, prefix, canonical):
+        """Optimal moves for a canonical state, in canonical container order, or None."""
+        moves = self.lookup(prefix, canonical)
+        if moves is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return moves
+
+    def lookup(self, prefix, canonical):
+        """Like get(), but without touching the hit/miss counters."""
+        if canonical not in self.keys(prefix):
+            return None
+        key = f"{prefix}:{canonical:x}"
+        with self._lock:
+            row = self._conn.execute("SELECT moves FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.keys(prefix).discard(canonical)  # Deleted behind our back, e.g. by another process
+                return None
+            self._touched[key] = time.time()
+        return unpack_moves(row[0])
+
+    def put_many(self, prefix, entries):
+        """Store (canonical, moves) pairs, then evict the oldest entries over the limit."""
+        now = time.time()
+        rows = [(f"{prefix}:{canonical:x}", pack_moves(moves), len(moves), now)
+                for canonical, moves in entries]
+        with self._lock:
+            self._write_touches()  # Before the inserts, which carry a newer time
+            self._conn.executemany("INSERT OR REPLACE INTO solutions VALUES (?, ?, ?, ?)", rows)
+            keys = self.keys(prefix)
+            for canonical, _ in entries:
+                keys.add(canonical)
+            self._evict()
+            self._conn.commit()
+
+    def flush(self):
+        """Write the last-used times of entries read since the previous write, in one commit."""
+        with self._lock:
+            if self._touched:
+                self._write_touches()
+                self._conn.commit()
+
+    def _write_touches(self):
+        self._conn.executemany("UPDATE solutions SET last_used = ? WHERE key = ?",
+                               [(used, key) for key, used in self._touched.items()])
+        self._touched.clear()
+
+    def _evict(self):
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM solutions").fetchone()
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        stale = self._conn.execute(
+            "SELECT key FROM solutions ORDER BY last_used LIMIT ?", (excess,)).fetchall()
+        self._conn.executemany("DELETE FROM solutions WHERE key = ?", stale)
+        for (key,) in stale:
+            prefix, _, code = key.rpartition(":")
+            self._keys.get(prefix, set()).discard(int(code, 16))
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": sum(len(keys) for keys in self._keys.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "intermediate_hits": self.intermediate_hits,
+        }
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+def pack_moves(moves):
+    """Two bytes per move: the source and target container index."""
+    return bytes(index for move in moves for index in move)
+
+
+def unpack_moves(blob):
+    return [(blob[k], blob[k + 1]) for k in range(0, len(blob), 2)]
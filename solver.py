@@ -0,0 +1,668 @@
+"""Search engines for the Color Sort puzzle.
+
+A state is a tuple of tuples, one per container, listing the balls from the
+bottom up - the same shape find_solution_from_current_state has always used.
+A move is a (from_idx, to_idx) pair of container indices.  Internally the
+search runs on packed integer states (see packed_state.StateCodec).
+"""
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+
+from packed_state import StateCodec
+
+
+def is_solved(state, capacity):
+    """Every non-empty container is full and holds a single color."""
+    for container in state:
+        if len(container) > 0:
+            if len(container) != capacity or len(set(container)) > 1:
+                return False
+    return True
+
+
+def apply_move(state, from_idx, to_idx, capacity):
+    """Return the state after moving the top ball, or None if the move is illegal."""
+    source = state[from_idx]
+    target = state[to_idx]
+    if from_idx == to_idx or not source or len(target) >= capacity:
+        return None
+    if target and source[-1] != target[-1]:
+        return None
+    new_state = list(state)
+    new_state[from_idx] = source[:-1]
+    new_state[to_idx] = target + source[-1:]
+    return tuple(new_state)
+
+
+def successors(state, capacity):
+    """Yield (from_idx, to_idx, new_state) for every legal move."""
+    num_containers = len(state)
+    for i in range(num_containers):
+        for j in range(num_containers):
+            if i != j:
+                new_state = apply_move(state, i, j, capacity)
+                if new_state is not None:
+                    yield i, j, new_state
+
+
+def blocking_heuristic(codec, code):
+    """Count the balls sitting above a ball of a different color.
+
+    Every such ball has to leave its container at least once, so the count
+    never overestimates the number of remaining moves.
+    """
+    total = 0
+    for field in codec.tubes(code):
+        if field:
+            _, run, height = codec.tube_info(field)
+            total += height - run
+    return total
+
+
+def split_heuristic(codec, code):
+    """blocking_heuristic plus the cost of colors split across containers.
+
+    A color finishes in exactly one container, so when its bottom runs start
+    in several containers every run except the largest has to move as well.
+    """
+    total = 0
+    runs = {}
+    for field in codec.tubes(code):
+        if field:
+            color, run, height = codec.tube_info(field)
+            total += height - run
+            runs.setdefault(color, []).append(run)
+    for color_runs in runs.values():
+        if len(color_runs) > 1:
+            total += sum(color_runs) - max(color_runs)
+    return total
+
+
+HEURISTICS = {
+    "blocking": blocking_heuristic,
+    "split": split_heuristic,
+}
+
+
+class SolveResult:
+    """Outcome of one solve() call."""
+
+    def __init__(self, mode, status, moves=None, optimal=False,
+                 nodes_expanded=0, nodes_generated=0, states_stored=0, elapsed=0.0, cache_hit=False,
+                 nodes_pruned=0, frontier_peak=0, timings=None):
+        self.mode = mode
+        self.status = status  # "solved", "unsolvable", "timeout", "exhausted", "cancelled" or "failed"
+        self.moves = moves
+        self.optimal = optimal
+        self.nodes_expanded = nodes_expanded
+        self.nodes_generated = nodes_generated
+        self.states_stored = states_stored  # Distinct (canonical) states kept in the visited set
+        self.elapsed = elapsed
+        self.cache_hit = cache_hit  # Answered straight from the solution cache
+        self.nodes_pruned = nodes_pruned  # Moves skipped by the pruning rules
+        self.frontier_peak = frontier_peak  # Largest open list / queue / search path seen
+        self.timings = timings or {}  # Seconds spent per phase: prepare, search, store
+        self.memory_peak = None  # Bytes allocated at the peak, with Solver(trace_memory=True)
+        self.profile = None  # Hottest functions, with Solver(profile=True)
+
+    @property
+    def found(self):
+        return self.moves is not None
+
+    @property
+    def memory_estimate(self):
+        """Search footprint estimated from the stored states (see STATE_BYTES_ESTIMATE)."""
+        return self.states_stored * STATE_BYTES_ESTIMATE[self.mode]
+
+    def as_dict(self):
+        """Counters, timings and memory of this solve, ready for json.dumps()."""
+        return {
+            "mode": self.mode,
+            "status": self.status,
+            "length": len(self.moves) if self.moves is not None else None,
+            "optimal": self.optimal,
+            "cache_hit": self.cache_hit,
+            "nodes_expanded": self.nodes_expanded,
+            "nodes_generated": self.nodes_generated,
+            "nodes_pruned": self.nodes_pruned,
+            "states_stored": self.states_stored,
+            "frontier_peak": self.frontier_peak,
+            "memory_estimate": self.memory_estimate,
+            "memory_peak": self.memory_peak,
+            "elapsed": self.elapsed,
+            "timings": self.timings,
+            "profile": self.profile,
+        }
+
+    def __repr__(self):
+        length = len(self.moves) if self.moves is not None else None
+        return (f"SolveResult(mode={self.mode!r}, status={self.status!r}, length={length}, "
+                f"expanded={self.nodes_expanded}, generated={self.nodes_generated}, "
+                f"pruned={self.nodes_pruned}, stored={self.states_stored}, "
+                f"elapsed={self.elapsed:.3f}s)")
+
+
+def _profile_summary(profiler, limit=15):
+    """The functions with the most own time, as JSON-friendly dicts."""
+    import pstats
+
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:limit]
+    return [{"function": f"{os.path.basename(filename)}:{line}({name})", "calls": calls,
+             "tottime": round(tottime, 6), "cumtime": round(cumtime, 6)}
+            for (filename, line, name), (_, calls, tottime, cumtime, _) in rows]
+
+
+# Rough cost of one stored state per mode, measured with tracemalloc: a
+# visited-set entry (key, parent state, move, hash slot), plus for the A*
+# modes its g-score and heap entry.  Used to enforce max_memory without
+# measuring the heap during the search.  IDA* only stores its current path.
+STATE_BYTES_ESTIMATE = {"bfs": 250, "bidirectional": 250, "idastar": 250, "astar": 360, "weighted": 360}
+
+
+class _Timeout(Exception):
+    pass
+
+
+class _Exhausted(Exception):
+    pass
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _SearchRun:
+    """Per-call counters and limits, so one Solver can serve several threads."""
+
+    def __init__(self, time_budget, max_nodes, max_memory, cancel, state_bytes):
+        self.cancel = cancel
+        self.deadline = None if time_budget is None else time.monotonic() + time_budget
+        self.max_nodes = float("inf") if max_nodes is None else max_nodes
+        self.max_states = float("inf") if max_memory is None else max_memory // state_bytes
+        self.expanded = 0
+        self.generated = 0
+        self.stored = 0
+        self.frontier_peak = 0
+
+    def check_limits(self, stored):
+        if self.expanded > self.max_nodes or stored > self.max_states:
+            raise _Exhausted()
+        # Only look at the clock and the cancel flag every 1024 expansions
+        if self.expanded & 1023 == 0:
+            if self.deadline is not None and time.monotonic() > self.deadline:
+                raise _Timeout()
+            if self.cancel is not None and self.cancel():
+                raise _Cancelled()
+
+
+class _KnownStates:
+    """Known-path table that falls back to the solution cache for other states."""
+
+    def __init__(self, table, codec, cache, canonical_keys):
+        self.table = table
+        self.codec = codec
+        self.cache = cache
+        self.prefix = cache.prefix(codec)
+        self.cached = cache.keys(self.prefix)
+        self.canonical = (lambda key: key) if canonical_keys else codec.canonical
+
+    def get(self, key):
+        """(canonical, moves, index) for a state on a known path, or None.
+
+        A cached row can disappear between the key check and the read (evicted
+        by another solver), so a miss is only known once the row is read.
+        """
+        entry = self.table.get(key)
+        if entry is None and self.canonical(key) in self.cached:
+            canonical = self.canonical(key)
+            moves = self.cache.lookup(self.prefix, canonical)
+            if moves is None:
+                return None
+            self.cache.intermediate_hits += 1
+            entry = self.table[key] = (canonical, moves, 0)
+        return entry
+
+
+class Solver:
+    """Pluggable solver engine.
+
+    Modes:
+      "bfs"      - uninformed breadth-first search (optimal).  With symmetry=False
+                   and prune=False it searches like the original game code.
+      "astar"    - A* with an admissible heuristic (optimal).
+      "idastar"  - iterative-deepening A*, optimal with very little memory.
+      "weighted" - weighted A* (f = g + weight * h); finds a valid but possibly
+                   longer solution much faster.  It stops at its first solution,
+                   so there is no partial answer: running out of `time_budget`
+                   returns status "timeout" with no moves, like the other modes.
+      "bidirectional" - breadth-first from the start and, with inverse moves,
+                   backwards from the solved board until the two meet (optimal).
+                   The goal is every container order of the solved board, so
+                   this mode always uses symmetry reduction.
+
+    With `symmetry` on (the default) states that only differ by the order of
+    the containers share one entry in the visited set.  The search itself
+    keeps the real container order, so returned moves always use the indices
+    of the board that was passed in.
+
+    `max_nodes` caps the number of expanded states and `max_memory` (bytes,
+    estimated from the stored states with the mode's STATE_BYTES_ESTIMATE)
+    caps the search's footprint; hitting either returns a result with status
+    "exhausted" instead of growing until the process runs out of memory.
+
+    With `prune` on (the default) the search skips moves that never shorten a
+    solution (see StateCodec.pruned_successors), and boards that can be seen
+    to be unsolvable without searching are rejected straight away.
+
+    Every SolveResult carries counters, phase timings and the frontier peak
+    (see SolveResult.as_dict).  The costlier measurements are opt-in:
+    `trace_memory` records the real allocation peak with tracemalloc,
+    `profile` runs each solve under cProfile and keeps the hottest functions,
+    and `metrics_log` names a file that gets one JSON line per solve.
+
+    With a SolutionCache attached, solve() answers cached boards without
+    searching, ends early when the search reaches any cached state, and
+    stores every board along each new optimal solution.
+    """
+
+    MODES = ("bfs", "astar", "idastar", "weighted", "bidirectional")
+
+    def __init__(self, mode="astar", capacity=4, heuristic="split", weight=2.0, time_budget=None,
+                 symmetry=True, max_nodes=None, max_memory=None, cache=None, prune=True,
+                 trace_memory=False, profile=False, metrics_log=None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown solver mode: {mode!r}")
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Unknown heuristic: {heuristic!r}")
+        self.mode = mode
+        self.capacity = capacity
+        self.heuristic_name = heuristic
+        self.heuristic = HEURISTICS[heuristic]
+        self.weight = weight
+        self.time_budget = time_budget
+        self.symmetry = symmetry
+        self.max_nodes = max_nodes
+        self.max_memory = max_memory
+        self.cache = cache
+        self.prune = prune
+        self.trace_memory = trace_memory
+        self.profile = profile
+        self.metrics_log = metrics_log
+
+    def solve(self, state, colors=None, cancel=None, known_paths=None):
+        """Solve a tuple-of-tuples state.
+
+        `colors` fixes the palette order used for packing.  `cancel` is an
+        optional callable polled during the search; once it returns True the
+        search stops with status "cancelled".
+
+        `known_paths` is a list of (state, moves) pairs from earlier optimal
+        solves.  Every state along those paths has a known distance to the
+        goal, so the search finishes as soon as it can prove that rejoining
+        one of them is the shortest way (A* modes; the others only use it
+        when the start state itself is known).
+        """
+        # The diagnostics modules are only imported when switched on, so a plain solve doesn't pay for them
+        if self.trace_memory:
+            import tracemalloc
+
+            tracing = not tracemalloc.is_tracing()
+            if tracing:
+                tracemalloc.start()
+            else:
+                tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        profiler = None
+        if self.profile:
+            import cProfile
+
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            result = self._solve(state, colors, cancel, known_paths)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1] - baseline
+                if tracing:
+                    tracemalloc.stop()
+        if self.trace_memory:
+            result.memory_peak = peak
+        if profiler is not None:
+            result.profile = _profile_summary(profiler)
+        if self.metrics_log is not None:
+            import json
+
+            with open(self.metrics_log, "a") as log:
+                log.write(json.dumps(result.as_dict()) + "\n")
+        return result
+
+    def _solve(self, state, colors, cancel, known_paths):
+        state = tuple(tuple(container) for container in state)
+        codec = StateCodec.for_state(state, self.capacity, colors)
+        run = _SearchRun(self.time_budget, self.max_nodes, self.max_memory, cancel,
+                         STATE_BYTES_ESTIMATE[self.mode])
+        start = prepared = time.perf_counter()
+        cache_hit = False
+        try:
+            code = codec.encode(state)
+            key = self._key_function(codec)
+            known = self._known_table(codec, key, known_paths) if known_paths else None
+            cached = None
+            if self.cache is not None:
+                known = _KnownStates(known or {}, codec, self.cache, self.symmetry)
+                cached = self.cache.get(known.prefix, codec.canonical(code))
+            prepared = time.perf_counter()
+            if cached is not None:
+                cache_hit = True
+                moves = self._known_tail(codec, (codec.canonical(code), cached, 0), code)
+            elif known is not None and known.get(key(code)) is not None:
+                moves = self._known_tail(codec, known.get(key(code)), code)
+            elif self.prune and self.dead_end(codec, code):
+                moves = None
+            elif self.mode == "bfs":
+                moves = self._bfs(run, codec, code)
+            elif self.mode == "idastar":
+                moves = self._idastar(run, codec, code)
+            elif self.mode == "bidirectional":
+                moves = self._bidirectional(run, codec, code)
+            else:
+                weight = self.weight if self.mode == "weighted" else 1.0
+                moves = self._astar(run, codec, code, weight, known)
+            status = "solved" if moves is not None else "unsolvable"
+        except _Timeout:
+            moves = None
+            status = "timeout"
+        except _Exhausted:
+            moves = None
+            status = "exhausted"
+        except _Cancelled:
+            moves = None
+            status = "cancelled"
+        searched = time.perf_counter()
+        optimal = moves is not None and (cache_hit or self.mode != "weighted")
+        if self.cache is not None:
+            if optimal and not cache_hit:
+                self._store_solution(codec, code, moves)
+            self.cache.flush()  # Last-used times of the entries this solve read
+        end = time.perf_counter()
+        timings = {"prepare": prepared - start, "search": searched - prepared, "store": end - searched}
+        return SolveResult(self.mode, status, moves, optimal, run.expanded, run.generated,
+                           run.stored, end - start, cache_hit, codec.pruned, run.frontier_peak, timings)
+
+    @staticmethod
+    def dead_end(codec, code):
+        """True when a packed state can be seen to be unsolvable without searching.
+
+        The balls have to fit into full single-color containers, and an
+        unsolved board needs at least one legal move.
+        """
+        if codec.solved_state(code) is None:
+            return True
+        return not codec.is_solved(code) and next(codec.successors(code), None) is None
+
+    def _store_solution(self, codec, state, moves):
+        """Cache every board on an optimal path, each with its remaining moves."""
+        entries = []
+        for index in range(len(moves) + 1):
+            canonical = codec.canonical(state)
+            perm = codec.tube_permutation(state, canonical)
+            entries.append((canonical, [(perm[i], perm[j]) for i, j in moves[index:]]))
+            if index < len(moves):
+                state = codec.apply_move(state, *moves[index])
+        self.cache.put_many(self.cache.prefix(codec), entries)
+
+    def _successors(self, codec):
+        return codec.pruned_successors if self.prune else codec.successors
+
+    def _key_function(self, codec):
+        # Identity when symmetry is off keeps both paths on the same code
+        return codec.canonical if self.symmetry else int
+
+    @staticmethod
+    def _known_table(codec, key, known_paths):
+        """Index every state on the known paths: key -> (state, moves, index of next move)."""
+        known = {}
+        for start, moves in known_paths:
+            code = codec.encode(start)
+            for index in range(len(moves) + 1):
+                known.setdefault(key(code), (code, moves, index))
+                if index == len(moves):
+                    break
+                code = codec.apply_move(code, *moves[index])
+                if code is None:
+                    break  # Not a legal path for this board, keep what was checked
+        return known
+
+    @staticmethod
+    def _known_tail(codec, entry, state):
+        """Remaining moves of a known path, translated to the container order of `state`."""
+        known_state, moves, index = entry
+        tail = moves[index:]
+        if known_state != state:
+            perm = codec.tube_permutation(known_state, state)
+            tail = [(perm[i], perm[j]) for i, j in tail]
+        return list(tail)
+
+    def _bfs(self, run, codec, initial_state):
+        key = self._key_function(codec)
+        successors = self._successors(codec)
+        queue = deque([initial_state])
+        # The queue only holds states; the path is rebuilt from parent pointers
+        came_from = {key(initial_state): None}
+
+        try:
+            while queue:
+                state = queue.popleft()
+                if codec.is_solved(state):
+                    return self._reconstruct(codec, key, came_from, initial_state, state)[0]
+                run.expanded += 1
+                run.check_limits(len(came_from))
+                if len(queue) > run.frontier_peak:
+                    run.frontier_peak = len(queue)
+                for i, j, new_state in successors(state):
+                    run.generated += 1
+                    new_key = key(new_state)
+                    if new_key not in came_from:
+                        came_from[new_key] = (state, (i, j))
+                        queue.append(new_state)
+            return None
+        finally:
+            run.stored = len(came_from)
+
+    def _bidirectional(self, run, codec, initial_state):
+        # Canonical keys turn the goal set (every container order of the solved
+        # board) into a single state the backward search can start from.
+        key = codec.canonical
+        successors = self._successors(codec)
+        goal = codec.solved_state(initial_state)
+        if goal is None:
+            return None
+        if codec.is_solved(initial_state):
+            return []
+        # forward[key] = (parent state, move), as in _bfs.  backward[key] =
+        # (state, move) where the move, in that state's container order, is one
+        # step closer to the goal.
+        forward = {key(initial_state): None}
+        backward = {key(goal): None}
+        forward_layer = [initial_state]
+        backward_layer = [goal]
+        meeting = None
+
+        try:
+            # Grow whichever frontier is smaller by one full layer.  Every state is
+            # checked against the other side when it is first reached, so the
+            # first meeting lies on a shortest path.
+            while meeting is None and forward_layer and backward_layer:
+                next_layer = []
+                if len(forward_layer) <= len(backward_layer):
+                    for state in forward_layer:
+                        run.expanded += 1
+                        run.check_limits(len(forward) + len(backward))
+                        for i, j, new_state in successors(state):
+                            run.generated += 1
+                            new_key = key(new_state)
+                            if new_key not in forward:
+                                forward[new_key] = (state, (i, j))
+                                if new_key in backward:
+                                    meeting = new_state
+                                    break
+                                next_layer.append(new_state)
+                        if meeting is not None:
+                            break
+                    forward_layer = next_layer
+                else:
+                    for state in backward_layer:
+                        run.expanded += 1
+                        run.check_limits(len(forward) + len(backward))
+                        for i, j, previous in codec.predecessors(state):
+                            run.generated += 1
+                            previous_key = key(previous)
+                            if previous_key not in backward:
+                                backward[previous_key] = (previous, (i, j))
+                                if previous_key in forward:
+                                    meeting = previous
+                                    break
+                                next_layer.append(previous)
+                        if meeting is not None:
+                            break
+                    backward_layer = next_layer
+                run.frontier_peak = max(run.frontier_peak, len(forward_layer) + len(backward_layer))
+            if meeting is None:
+                return None
+
+            path, current = self._reconstruct(codec, key, forward, initial_state, meeting)
+            entry = backward[key(current)]
+            while entry is not None:
+                state, (i, j) = entry
+                if state != current:
+                    perm = codec.tube_permutation(state, current)
+                    i, j = perm[i], perm[j]
+                path.append((i, j))
+                current = codec.apply_move(current, i, j)
+                entry = backward[key(current)]
+            return path
+        finally:
+            run.stored = len(forward) + len(backward)
+
+    def _astar(self, run, codec, initial_state, weight, known=None):
+        key = self._key_function(codec)
+        successors = self._successors(codec)
+        heuristic = self.heuristic
+        tie = itertools.count()
+        initial_key = key(initial_state)
+        g_score = {initial_key: 0}
+        # came_from[key] = (parent state, move); the parent is stored in its real
+        # container order so the path can be replayed from the initial board.
+        came_from = {initial_key: None}
+        # Heap entries are (f, -g, tie, state, g of a known-path exit or None).
+        # Ties on f are broken towards deeper nodes, which reach the goal sooner.
+        open_heap = [(weight * heuristic(codec, initial_state), 0, next(tie), initial_state, None)]
+
+        try:
+            while open_heap:
+                _, neg_g, _, state, exit_g = heapq.heappop(open_heap)
+                state_key = key(state)
+                if exit_g is not None:
+                    # Reaching a known-path state: its f is the exact cost of the
+                    # whole solution, so popping it means nothing cheaper is left.
+                    if exit_g > g_score[state_key]:
+                        continue
+                    path, current = self._reconstruct(codec, key, came_from, initial_state, state)
+                    return path + self._known_tail(codec, known.get(state_key), current)
+                g = -neg_g
+                if g > g_score[state_key]:
+                    continue  # Stale entry, a shorter route was found later
+                if codec.is_solved(state):
+                    return self._reconstruct(codec, key, came_from, initial_state, state)[0]
+                run.expanded += 1
+                run.check_limits(len(g_score))
+                if len(open_heap) > run.frontier_peak:
+                    run.frontier_peak = len(open_heap)
+                new_g = g + 1
+                for i, j, new_state in successors(state):
+                    run.generated += 1
+                    new_key = key(new_state)
+                    if new_g < g_score.get(new_key, new_g + 1):
+                        g_score[new_key] = new_g
+                        came_from[new_key] = (state, (i, j))
+                        entry = known.get(new_key) if known is not None else None
+                        if entry is not None:
+                            _, known_moves, index = entry
+                            total = new_g + len(known_moves) - index
+                            heapq.heappush(open_heap, (total, -total, next(tie), new_state, new_g))
+                            continue
+                        f = new_g + weight * heuristic(codec, new_state)
+                        heapq.heappush(open_heap, (f, -new_g, next(tie), new_state, None))
+            return None
+        finally:
+            run.stored = len(g_score)
+
+    @staticmethod
+    def _reconstruct(codec, key, came_from, initial_state, state):
+        steps = []
+        entry = came_from[key(state)]
+        while entry is not None:
+            steps.append(entry)
+            entry = came_from[key(entry[0])]
+        steps.reverse()
+
+        # A stored parent may be a tube permutation of the state actually reached
+        # along the path, so translate each move into the current container order.
+        path = []
+        current = initial_state
+        for parent, (i, j) in steps:
+            if parent != current:
+                perm = codec.tube_permutation(parent, current)
+                i, j = perm[i], perm[j]
+            path.append((i, j))
+            current = codec.apply_move(current, i, j)
+        return path, current
+
+    def _idastar(self, run, codec, initial_state):
+        key = self._key_function(codec)
+        successors = self._successors(codec)
+        heuristic = self.heuristic
+        path = []
+        on_path = {key(initial_state)}
+
+        def search(state, g, bound):
+            f = g + heuristic(codec, state)
+            if f > bound:
+                return f
+            if codec.is_solved(state):
+                return True
+            run.expanded += 1
+            run.check_limits(len(on_path))
+            if g > run.frontier_peak:
+                run.frontier_peak = g
+            next_bound = float("inf")
+            for i, j, new_state in successors(state):
+                run.generated += 1
+                new_key = key(new_state)
+                if new_key in on_path:
+                    continue
+                path.append((i, j))
+                on_path.add(new_key)
+                found = search(new_state, g + 1, bound)
+                if found is True:
+                    return True
+                path.pop()
+                on_path.discard(new_key)
+                next_bound = min(next_bound, found)
+            return next_bound
+
+        bound = heuristic(codec, initial_state)
+        while True:
+            found = search(initial_state, 0, bound)
+            if found is True:
+                run.stored = len(on_path)
+                return path
+            if found == float("inf"):
+                return None
+            bound = found
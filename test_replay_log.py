@@ -0,0 +1,57 @@
+"""Replay log checks.  Run from the repository root with `python -m pytest`."""
+import random
+
+import pytest
+
+from color_sort_core import PuzzleSpec, generate_solvable_containers
+from replay_log import Replay, ReplayWriter, verify
+from solver import Solver
+
+SPEC = PuzzleSpec()
+
+
+def board(index=0):
+    return generate_solvable_containers(SPEC, random.Random(f"replay:{index}"))[0]
+
+
+def write_log(path, containers, plan, snapshot_interval):
+    """Log `plan`, returning the packed board after every move."""
+    writer = ReplayWriter(str(path), SPEC, containers, seed=7, snapshot_interval=snapshot_interval)
+    states = [writer.state]
+    for move in plan:
+        writer.append(*move)
+        states.append(writer.state)
+    writer.close()
+    return states
+
+
+def test_replay_round_trip(tmp_path):
+    plan = Solver(mode="bfs", symmetry=False, prune=False).solve(board(), colors=SPEC.colors).moves
+    path = tmp_path / "game.csreplay"
+    states = write_log(path, board(), plan, snapshot_interval=4)
+    replay = Replay(str(path))
+    assert (replay.spec, replay.seed, len(replay)) == (SPEC, "7", len(plan))
+    assert replay.moves() == plan
+    assert [replay.packed_state_at(index) for index in range(len(plan) + 1)] == states
+    report = verify(str(path))
+    assert report["error"] is None and report["moves"] == len(plan) and report["solved"]
+
+
+def test_replay_cut_inside_snapshot(tmp_path):
+    plan = Solver().solve(board(1), colors=SPEC.colors).moves[:8]
+    path = tmp_path / "game.csreplay"
+    states = write_log(path, board(1), plan, snapshot_interval=8)
+    path.write_bytes(path.read_bytes()[:-2])  # The 8th move's record loses the end of its snapshot
+    replay = Replay(str(path))
+    assert len(replay) == 7 and replay.packed_state_at(7) == states[7]
+    report = verify(str(path))
+    assert report["moves"] == 7 and report["error"] is not None
+
+
+def test_replay_rejects_illegal_moves(tmp_path):
+    containers = board(2)
+    writer = ReplayWriter(str(tmp_path / "game.csreplay"), SPEC, containers)
+    empty = next(index for index, container in enumerate(containers) if not container)
+    with pytest.raises(ValueError):
+        writer.append(empty, (empty + 1) % SPEC.num_containers)
+    writer.close()
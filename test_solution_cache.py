@@ -0,0 +1,67 @@
+"""Solution cache checks.  Run from the repository root with `python -m pytest`."""
+import random
+import sqlite3
+import time
+
+from color_sort_core import ColorSortBoard, PuzzleSpec, generate_solvable_containers
+from solution_cache import SolutionCache
+from solver import Solver
+
+SPEC = PuzzleSpec()
+
+
+def board(index=0):
+    return generate_solvable_containers(SPEC, random.Random(f"cache:{index}"))[0]
+
+
+def solves(containers, moves):
+    game = ColorSortBoard(spec=SPEC)
+    game.load_state(containers)
+    for from_idx, to_idx in moves:
+        assert game.move_ball(from_idx, to_idx)
+    return game.is_solved(game.containers)
+
+
+def test_cache_serves_container_permutations(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite3"))
+    solver = Solver(cache=cache)
+    first = solver.solve(board(), colors=SPEC.colors)
+    permuted = list(reversed(board()))
+    second = solver.solve(permuted, colors=SPEC.colors)
+    assert not first.cache_hit and second.cache_hit
+    assert len(second.moves) == len(first.moves) and solves(permuted, second.moves)
+    cache.close()
+
+
+def test_cache_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SolutionCache(path)
+    Solver(cache=cache).solve(board(), colors=SPEC.colors)
+    cache.close()
+    cache = SolutionCache(path)
+    assert Solver(cache=cache).solve(board(), colors=SPEC.colors).cache_hit
+    cache.close()
+
+
+def test_rows_deleted_by_another_process_are_misses(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = SolutionCache(path)
+    solver = Solver(cache=cache)
+    first = solver.solve(board(), colors=SPEC.colors)
+    with sqlite3.connect(path) as other:
+        other.execute("DELETE FROM solutions")
+    second = solver.solve(board(), colors=SPEC.colors)
+    assert not second.cache_hit and second.status == "solved"
+    assert len(second.moves) == len(first.moves) and solves(board(), second.moves)
+    cache.close()
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = SolutionCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    for canonical in (1, 2, 3):
+        cache.put_many("test", [(canonical, [(0, 1)])])
+        time.sleep(0.01)  # Distinct last-used times
+    cache.lookup("test", 1)  # Entry 2 is now the least recently used
+    cache.put_many("test", [(4, [(1, 0)])])
+    assert cache.keys("test") == {1, 3, 4}
+    cache.close()
@@ -0,0 +1,78 @@
+"""Solver checks on seeded boards.  Run from the repository root with `python -m pytest`."""
+import random
+from collections import deque
+
+import pytest
+
+from color_sort_core import ColorSortBoard, PuzzleSpec, generate_solvable_containers, scrambled_containers
+from solver import Solver
+
+SPEC = PuzzleSpec()
+BOARDS = [generate_solvable_containers(SPEC, random.Random(f"test:{index}"))[0] for index in range(12)]
+OPTIMAL_MODES = ["bfs", "astar", "idastar", "bidirectional"]
+
+
+def original_length(board):
+    """Solution length from breadth-first search without symmetry reduction or pruning."""
+    return len(Solver(mode="bfs", symmetry=False, prune=False).solve(board, colors=SPEC.colors).moves)
+
+
+def solves(board, moves, spec=SPEC):
+    """Play `moves` with the game's rules; True if they end sorted, failing on an illegal move."""
+    game = ColorSortBoard(spec=spec)
+    game.containers = [deque(container) for container in board]
+    for number, (from_idx, to_idx) in enumerate(moves, start=1):
+        assert game.move_ball(from_idx, to_idx), f"move {number} ({from_idx} -> {to_idx}) is illegal"
+    return game.is_solved(game.containers)
+
+
+@pytest.fixture(scope="module")
+def lengths():
+    return [original_length(board) for board in BOARDS]
+
+
+@pytest.mark.parametrize("prune", [True, False])
+@pytest.mark.parametrize("symmetry", [True, False])
+@pytest.mark.parametrize("mode", OPTIMAL_MODES)
+def test_optimal_modes_match_original_bfs(mode, symmetry, prune, lengths):
+    solver = Solver(mode=mode, symmetry=symmetry, prune=prune)
+    for board, length in zip(BOARDS, lengths):
+        result = solver.solve(board, colors=SPEC.colors)
+        assert result.optimal and len(result.moves) == length
+        assert solves(board, result.moves)
+
+
+@pytest.mark.parametrize("prune", [True, False])
+def test_weighted_moves_are_legal(prune, lengths):
+    solver = Solver(mode="weighted", prune=prune)
+    for board, length in zip(BOARDS, lengths):
+        result = solver.solve(board, colors=SPEC.colors)
+        assert solves(board, result.moves) and len(result.moves) >= length
+
+
+def test_symmetry_maps_moves_to_real_containers():
+    # Every container order of a board shares one canonical state; each order gets its own moves
+    board = BOARDS[0]
+    solver = Solver()
+    for shift in range(SPEC.num_containers):
+        rotated = board[shift:] + board[:shift]
+        assert solves(rotated, solver.solve(rotated, colors=SPEC.colors).moves)
+
+
+@pytest.mark.parametrize("limit", [{"max_nodes": 50}, {"max_memory": 10_000}])
+def test_search_limits_stop_with_exhausted(limit):
+    spec = PuzzleSpec(8, 2, 4)
+    board = generate_solvable_containers(spec, random.Random("test:limits"))[0]
+    result = Solver(mode="bfs", capacity=spec.capacity, **limit).solve(board, colors=spec.colors)
+    assert result.status == "exhausted" and result.moves is None
+
+
+def test_unsolvable_board_is_reported():
+    assert Solver(capacity=2).solve((("red", "blue"), ("blue", "red"))).status == "unsolvable"
+
+
+def test_scrambled_boards_are_solvable():
+    spec = PuzzleSpec(6, 1, 4)
+    for seed in range(3):
+        board = scrambled_containers(spec, random.Random(seed))
+        assert solves(board, Solver(mode="weighted").solve(board, colors=spec.colors).moves, spec)